@@ -0,0 +1,208 @@
+# benchmarks/bench_bot.py
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# The harness never talks to Discord, so it only needs placeholder channels and a scratch data dir
+for key in ("PRICE_CHANNEL_ID", "TRADE_HISTORY_CHANNEL_ID", "TRADING_CHANNEL_ID"):
+    os.environ.setdefault(key, "0")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="darkerdb-bench-"))
+os.environ.setdefault("WATCHLIST_PATH", "")
+
+from benchmarks.fake_api import FakeDarkerDB
+from common.api import DarkerDBClient
+from common.items import ItemMetadataCache
+from common.charts import ChartRenderer
+from common.history_store import PriceHistoryStore
+from bots.live_market import LiveMarketCog
+from bots.trading_post import TradingPostCog
+from bots.trade_history import get_all_trades
+from bots.price_history import PriceHistoryCog
+
+SCENARIOS = ("market_tick", "trading_post", "trade_crawl", "find")
+
+class FakeMessage:
+    next_id = 1
+
+    def __init__(self, channel):
+        FakeMessage.next_id += 1
+        self.id = FakeMessage.next_id
+        self.channel = channel
+
+    async def pin(self):
+        pass
+
+class FakeChannel:
+    id = 1
+
+class FakeOutbound:
+    def __init__(self):
+        self.sent = 0
+
+    def done(self, result=None):
+        self.sent += 1
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(result)
+        return future
+
+    def send(self, channel, priority=None, **kwargs):
+        return self.done(FakeMessage(channel))
+
+    def edit(self, message, priority=None, **kwargs):
+        return self.done(message)
+
+    def submit(self, route, action, priority=None, coalesce_key=None, ordered=False):
+        return self.done()
+
+    def delete(self, message, priority=None):
+        return self.done()
+
+    def dm(self, user, priority=None, **kwargs):
+        return self.done()
+
+class FakeBot:
+    def __init__(self, api, items):
+        self.api = api
+        self.items = items
+        self.outbound = FakeOutbound()
+        self.cogs = {}
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+    def get_channel(self, channel_id):
+        return FakeChannel()
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def remove_dynamic_items(self, *items):
+        pass
+
+def summarize(name, samples, units=0, unit_name="items"):
+    samples = np.array(samples)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000
+    total = samples.sum()
+    line = (
+        f"{name:<14} {len(samples):>5} {p50:>9.1f} {p90:>9.1f} {p99:>9.1f} {samples.max() * 1000:>9.1f} "
+        f"{len(samples) / total:>8.2f}"
+    )
+    if units:
+        line += f" {units / total:>10.1f} {unit_name}/s"
+    print(line)
+
+async def timed(coro_factory, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+async def bench_market_tick(bot, iterations):
+    cog = LiveMarketCog(bot)
+    bot.cogs["LiveMarketCog"] = cog
+
+    async def tick():
+        cog.next_poll = dict.fromkeys(cog.next_poll, 0.0)
+        await cog.refresh_prices()
+        await cog.publish_pages(FakeChannel(), cog.build_market_embeds(cog.population_str))
+
+    samples = await timed(tick, iterations)
+    summarize("market_tick", samples, len(cog.watchlist) * iterations, "items")
+
+async def bench_trading_post(bot, iterations):
+    cog = TradingPostCog(bot)
+    await cog.cog_load()
+    bot.cogs["TradingPostCog"] = cog
+    posted = bot.outbound.sent
+
+    async def poll():
+        trades = await cog.fetch_chat_trades()
+        await cog.process_new_trades(trades, FakeChannel())
+
+    samples = await timed(poll, iterations)
+    await cog.cog_unload()
+    summarize("trading_post", samples, bot.outbound.sent - posted, "posts")
+
+async def bench_trade_crawl(bot, iterations):
+    rows = 0
+
+    async def crawl():
+        nonlocal rows
+        rows += len(await get_all_trades(bot.api, "Adventurer"))
+
+    samples = await timed(crawl, iterations)
+    summarize("trade_crawl", samples, rows, "rows")
+
+async def bench_find(bot, iterations, data_dir):
+    cog = PriceHistoryCog(bot)
+    cog.chart_renderer = ChartRenderer(max_workers=2)
+    cog.history_store = PriceHistoryStore(os.path.join(data_dir, f"bench_history_{time.time_ns()}.sqlite3"))
+    index = 0
+
+    async def find():
+        nonlocal index
+        index += 1
+        # A new item id each run exercises the full fetch path instead of the chart cache
+        await cog.build_history_chart(f"SpectralBlade_{index}", "Spectral Blade")
+
+    try:
+        await cog.build_history_chart("Warmup_0", "Warmup")
+        samples = await timed(find, iterations)
+    finally:
+        cog.chart_renderer.shutdown()
+        cog.history_store.close()
+    summarize("find", samples, iterations, "charts")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the bot against a fake DarkerDB API")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Base API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform +/- jitter in seconds")
+    parser.add_argument("--seller-rows", type=int, default=500)
+    parser.add_argument("--chat-batch", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    server = FakeDarkerDB(
+        latency=args.latency, jitter=args.jitter, seller_rows=args.seller_rows, chat_batch=args.chat_batch
+    )
+    await server.start()
+    data_dir = os.environ["DATA_DIR"]
+    api = DarkerDBClient(base_url=server.base_url)
+    await api.start()
+    items = ItemMetadataCache(api, os.path.join(data_dir, "bench_items.json"))
+    bot = FakeBot(api, items)
+    print(f"Fake API at {server.base_url}, latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f}ms")
+    print(f"{'scenario':<14} {'runs':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'runs/s':>8} {'throughput':>10}")
+    try:
+        for scenario in args.scenarios:
+            requests = server.requests
+            if scenario == "market_tick":
+                await bench_market_tick(bot, args.iterations)
+            elif scenario == "trading_post":
+                await bench_trading_post(bot, args.iterations)
+            elif scenario == "trade_crawl":
+                await bench_trade_crawl(bot, args.iterations)
+            elif scenario == "find":
+                await bench_find(bot, args.iterations, data_dir)
+            print(f"{'':<14} {server.requests - requests} API requests")
+    finally:
+        await items.close()
+        await api.close()
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
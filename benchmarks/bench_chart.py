@@ -0,0 +1,61 @@
+# benchmarks/bench_chart.py
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.charts import to_candle_arrays, filter_outliers_iqr, render_candle_chart
+
+def synthetic_history(days, interval_minutes=30, seed=0):
+    rng = np.random.default_rng(seed)
+    count = days * 24 * 60 // interval_minutes
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(days=days)
+    avg = np.maximum(1, 300 + np.cumsum(rng.normal(0, 3, count)))
+    spread = np.abs(rng.normal(0, 8, count))
+    spikes = rng.random(count) < 0.02
+    high = avg + spread + spikes * avg * 4
+    low = np.maximum(1, avg - spread)
+    volume = rng.integers(1, 50, count)
+    return [
+        {
+            "timestamp": (start + timedelta(minutes=interval_minutes * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "avg": float(avg[i]),
+            "min": float(low[i]),
+            "max": float(high[i]),
+            "volume": int(volume[i])
+        }
+        for i in range(count)
+    ]
+
+def timed(func, *args, repeat=5):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        samples.append(time.perf_counter() - start)
+    return result, min(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for the /find candle pipeline")
+    parser.add_argument("--days", type=int, nargs="+", default=[16, 30, 60, 90])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'buckets':>8} {'parse ms':>9} {'filter ms':>10} {'render ms':>10} {'png KiB':>8}")
+    for days in args.days:
+        market_data = synthetic_history(days)
+        candles, parse_time = timed(to_candle_arrays, market_data, repeat=args.repeat)
+        filtered, filter_time = timed(filter_outliers_iqr, candles, repeat=args.repeat)
+        (png, _), render_time = timed(render_candle_chart, filtered, "Benchmark", repeat=max(1, args.repeat // 2))
+        print(
+            f"{days:>5} {len(market_data):>8} {parse_time * 1000:>9.2f} {filter_time * 1000:>10.2f} "
+            f"{render_time * 1000:>10.1f} {len(png) / 1024:>8.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/fake_api.py
+import os
+import copy
+import json
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json"), "r") as f:
+        return json.load(f)
+
+def format_timestamp(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_timestamp(ts):
+    return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+class FakeDarkerDB:
+    def __init__(self, latency=0.05, jitter=0.02, seller_rows=500, page_size=50, chat_batch=20, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.seller_rows = seller_rows
+        self.page_size = page_size
+        self.chat_batch = chat_batch
+        self.rng = random.Random(seed)
+        self.listing = load_fixture("market_listing")
+        self.population = load_fixture("population")
+        self.chat_trade = load_fixture("chat_trade")
+        self.item = load_fixture("item")
+        self.bucket = load_fixture("history_bucket")
+        self.chat_sequence = 0
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def delay(self):
+        self.requests += 1
+        wait = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def ok(self, body, pagination=None):
+        data = {"status": "OK", "body": body}
+        if pagination is not None:
+            data["pagination"] = pagination
+        return web.json_response(data)
+
+    async def market(self, request):
+        await self.delay()
+        seller = request.query.get("seller")
+        if seller is None:
+            listing = dict(self.listing, item_id=request.query.get("item_id", self.listing["item_id"]))
+            listing["price"] = self.listing["price"] + self.rng.randint(-25, 25)
+            return self.ok([listing])
+        limit = int(request.query.get("limit", self.page_size))
+        offset = int(request.query.get("cursor", 0))
+        end = min(offset + limit, self.seller_rows)
+        rows = [dict(self.listing, id=self.listing["id"] + i, seller=seller) for i in range(offset, end)]
+        next_url = f"{self.base_url}/market?seller={seller}&cursor={end}" if end < self.seller_rows else None
+        return self.ok(rows, {"next": next_url})
+
+    async def population_handler(self, request):
+        await self.delay()
+        return self.ok(self.population)
+
+    async def chat(self, request):
+        await self.delay()
+        now = datetime.now(timezone.utc)
+        trades = []
+        for i in range(self.chat_batch):
+            self.chat_sequence += 1
+            trade = copy.deepcopy(self.chat_trade)
+            trade["timestamp"] = format_timestamp(now - timedelta(seconds=i))
+            trade["message"] = f"{trade['message']} #{self.chat_sequence}"
+            trade["items"][0]["secondary_strength"] = self.rng.randint(1, 3)
+            trades.append(trade)
+        return self.ok(trades)
+
+    async def items(self, request):
+        await self.delay()
+        archetype = request.query.get("archetype", self.item["archetype"])
+        body = []
+        for rarity_id in range(1001, 8001, 1000):
+            item = dict(self.item, id=f"{archetype}_{rarity_id}", archetype=archetype)
+            body.append(item)
+        return self.ok(body, {"num_pages": 1})
+
+    async def attributes(self, request):
+        await self.delay()
+        return self.ok([])
+
+    async def history(self, request):
+        await self.delay()
+        interval = timedelta(minutes=30)
+        now = datetime.now(timezone.utc)
+        start = parse_timestamp(request.query["from"]) if "from" in request.query else now - timedelta(days=4)
+        end = parse_timestamp(request.query["to"]) if "to" in request.query else now
+        cursor = start.replace(minute=start.minute - start.minute % 30, second=0, microsecond=0)
+        body = []
+        while cursor < end:
+            drift = self.rng.uniform(-15, 15)
+            body.append(dict(
+                self.bucket,
+                timestamp=format_timestamp(cursor),
+                avg=self.bucket["avg"] + drift,
+                min=self.bucket["min"] + drift,
+                max=self.bucket["max"] + drift + self.rng.uniform(0, 20)
+            ))
+            cursor += interval
+        return self.ok(body)
+
+    async def start(self, port=0):
+        app = web.Application()
+        app.router.add_get("/v1/market", self.market)
+        app.router.add_get("/v1/population", self.population_handler)
+        app.router.add_get("/v1/trades/chat", self.chat)
+        app.router.add_get("/v1/items", self.items)
+        app.router.add_get("/v1/items/attributes", self.attributes)
+        app.router.add_get("/v1/market/analytics/{item_id}/prices/history", self.history)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
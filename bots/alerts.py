@@ -0,0 +1,156 @@
+# bots/alerts.py
+import os
+import time
+import asyncio
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import logging
+from common.config import Config
+from common.alerts import AlertEngine
+from common.utils import read_json, write_json
+from common.outbound import FEED
+
+logger = logging.getLogger('DarkAndDarkerDB.Alerts')
+
+CONDITION_LABELS = {
+    "below": "price at or below {value:g}g",
+    "above": "price at or above {value:g}g",
+    "rise_1h": "up {value:g}% in 1h",
+    "drop_1h": "down {value:g}% in 1h",
+    "rise_24h": "up {value:g}% in 24h",
+    "drop_24h": "down {value:g}% in 24h",
+}
+
+CONDITION_CHOICES = [
+    app_commands.Choice(name="Price at or below X gold", value="below"),
+    app_commands.Choice(name="Price at or above X gold", value="above"),
+    app_commands.Choice(name="Up X% in 1h", value="rise_1h"),
+    app_commands.Choice(name="Down X% in 1h", value="drop_1h"),
+    app_commands.Choice(name="Up X% in 24h", value="rise_24h"),
+    app_commands.Choice(name="Down X% in 24h", value="drop_24h"),
+]
+
+def describe(alert, item_name):
+    return f"#{alert.id} {item_name}: {CONDITION_LABELS[alert.condition].format(value=alert.value)}"
+
+class AlertsCog(commands.Cog):
+    alert = app_commands.Group(name="alert", description="Manage price alerts for watched market items.")
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.config = Config()
+        self.path = os.path.join(self.config.DATA_DIR, "alerts.json")
+        self.engine = AlertEngine(cooldown=self.config.ALERT_COOLDOWN, max_per_user=self.config.ALERT_MAX_PER_USER)
+        self.dirty = False
+        self.notifications = set()
+
+    async def cog_load(self):
+        state = await asyncio.to_thread(read_json, self.path, {})
+        self.engine.restore(state)
+        if len(self.engine):
+            logger.info(f"Loaded {len(self.engine)} price alerts")
+        self.save_alerts.start()
+
+    async def cog_unload(self):
+        self.save_alerts.cancel()
+        if self.dirty:
+            await self.write_alerts()
+
+    async def write_alerts(self):
+        self.dirty = False
+        try:
+            await asyncio.to_thread(write_json, self.path, self.engine.snapshot(), separators=(",", ":"))
+        except Exception as e:
+            logger.error(f"Error saving alerts: {e}")
+
+    @tasks.loop(seconds=60)
+    async def save_alerts(self):
+        if self.dirty:
+            await self.write_alerts()
+
+    def watchlist(self):
+        market = self.bot.get_cog("LiveMarketCog")
+        return market.watchlist if market is not None else {}
+
+    def item_name(self, item_key):
+        return self.watchlist().get(item_key, {}).get("name", item_key)
+
+    def check_prices(self, metrics_by_item):
+        start = time.perf_counter()
+        fired = []
+        for item_key, metrics in metrics_by_item.items():
+            fired += self.engine.observe(item_key, metrics)
+        if metrics_by_item and len(self.engine):
+            self.dirty = True
+        for alert, value in fired:
+            task = asyncio.create_task(self.notify(alert, value))
+            self.notifications.add(task)
+            task.add_done_callback(self.notifications.discard)
+        if fired:
+            logger.info(
+                f"Checked {len(metrics_by_item)} items against {len(self.engine)} alerts in "
+                f"{(time.perf_counter() - start) * 1000:.1f}ms, {len(fired)} triggered"
+            )
+
+    async def notify(self, alert, value):
+        try:
+            user = self.bot.get_user(alert.user_id) or await self.bot.fetch_user(alert.user_id)
+            unit = "g" if alert.metric == "price" else "%"
+            content = f"🔔 {describe(alert, self.item_name(alert.item_key))} (now {value:g}{unit})"
+            await self.bot.outbound.dm(user, priority=FEED, content=content)
+        except Exception as e:
+            logger.error(f"Error sending alert #{alert.id} to {alert.user_id}: {e}")
+
+    @alert.command(name="add", description="Get a DM when a watched item meets a condition.")
+    @app_commands.describe(item="Watched market item", condition="When to alert", value="Price in gold or percent change")
+    @app_commands.choices(condition=CONDITION_CHOICES)
+    async def add(self, interaction: discord.Interaction, item: str, condition: app_commands.Choice[str], value: float):
+        if item not in self.watchlist():
+            await interaction.response.send_message("That item is not on the market watchlist.", ephemeral=True)
+            return
+        if value <= 0:
+            await interaction.response.send_message("Value must be greater than 0.", ephemeral=True)
+            return
+        try:
+            alert = self.engine.add(interaction.user.id, item, condition.value, value)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        self.dirty = True
+        await interaction.response.send_message(f"Alert added: {describe(alert, self.item_name(item))}", ephemeral=True)
+        current = self.engine.current(item, alert.metric)
+        if alert.holds(current):
+            alert.last_triggered = time.time()
+            await self.notify(alert, current)
+
+    @add.autocomplete("item")
+    async def item_autocomplete(self, interaction: discord.Interaction, current: str):
+        current = current.lower()
+        return [
+            app_commands.Choice(name=item["name"][:100], value=item_key)
+            for item_key, item in self.watchlist().items()
+            if current in item["name"].lower()
+        ][:25]
+
+    @alert.command(name="list", description="List your price alerts.")
+    async def list_alerts(self, interaction: discord.Interaction):
+        alerts = self.engine.for_user(interaction.user.id)
+        if not alerts:
+            await interaction.response.send_message("You have no price alerts.", ephemeral=True)
+            return
+        lines = [describe(alert, self.item_name(alert.item_key)) for alert in alerts]
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+    @alert.command(name="remove", description="Remove one of your price alerts.")
+    @app_commands.describe(alert_id="The alert number shown by /alert list")
+    async def remove(self, interaction: discord.Interaction, alert_id: int):
+        alert = self.engine.remove(alert_id, interaction.user.id)
+        if alert is None:
+            await interaction.response.send_message(f"No alert #{alert_id} found.", ephemeral=True)
+            return
+        self.dirty = True
+        await interaction.response.send_message(f"Removed {describe(alert, self.item_name(alert.item_key))}", ephemeral=True)
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(AlertsCog(bot))
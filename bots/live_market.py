@@ -1,37 +1,144 @@
 # bots/live_market.py
+import os
+import json
+import time
+import asyncio
+import hashlib
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
-import aiohttp
-from datetime import datetime, timedelta
+from array import array
+from datetime import datetime
 import logging
-from collections import deque
 from common.config import Config
-from common.constants import MONITORED_ITEMS, RARITY_COLORS
+from common.utils import read_json, write_json
+from common.indicators import PriceSeries, LONG_WINDOW
+from common.outbound import BACKGROUND
+from common.constants import RARITY_COLORS
+from common.watchlist import load_watchlist
+from common.metrics import TICK_SECONDS, TICK_ERRORS
 
 logger = logging.getLogger('DarkAndDarkerDB.LiveMarket')
 
+ITEMS_PER_EMBED = 24
+INDICATOR_SAVE_INTERVAL = 300
+
 class LiveMarketCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.config = Config()
-        self.price_message = None
+        self.watchlist = load_watchlist(self.config.WATCHLIST_PATH)
+        self.state_path = os.path.join(self.config.DATA_DIR, "live_market_state.json")
+        self.page_messages = []
+        self.page_fingerprints = []
+        self.attached = False
+        self.publish_lock = asyncio.Lock()
         self.current_prices = {}
-        self.price_history = {item_key: deque(maxlen=10) for item_key in MONITORED_ITEMS.keys()}
+        self.indicators_path = os.path.join(self.config.DATA_DIR, "market_indicators.json")
+        self.series_capacity = LONG_WINDOW // self.config.MARKET_MIN_POLL + 1
+        self.price_series = {item_key: PriceSeries(self.series_capacity) for item_key in self.watchlist}
+        self.last_indicator_save = time.monotonic()
+        self.stale_items = set()
+        self.last_tick_duration = None
+        self.poll_intervals = {item_key: self.config.MARKET_MIN_POLL for item_key in self.watchlist}
+        self.next_poll = {item_key: 0.0 for item_key in self.watchlist}
+        self.population_str = "*No population data*"
+        self.last_edit = 0.0
+
+    async def cog_load(self):
+        try:
+            restored = await asyncio.to_thread(self.load_indicators)
+        except Exception as e:
+            logger.error(f"Error loading market indicators: {e}")
+            return
+        for item_key, series in restored.items():
+            self.price_series[item_key] = series
+            self.current_prices[item_key] = series.last
+        if restored:
+            logger.info(f"Restored indicators for {len(restored)} items")
+
+    async def cog_unload(self):
+        self.update_price_tracker.cancel()
+        await self.save_indicators()
+
+    def load_indicators(self):
+        state = read_json(self.indicators_path, {})
+        return {
+            item_key: PriceSeries.from_dict(data, self.series_capacity)
+            for item_key, data in state.get("items", {}).items()
+            if item_key in self.price_series
+        }
+
+    async def save_indicators(self):
+        state = {"items": {item_key: series.to_dict() for item_key, series in self.price_series.items() if len(series)}}
+        self.last_indicator_save = time.monotonic()
+        try:
+            await asyncio.to_thread(
+                write_json, self.indicators_path, state, separators=(",", ":"), default=array.tolist
+            )
+        except Exception as e:
+            logger.error(f"Error saving market indicators: {e}")
+
+    async def get_market_channel(self):
+        channel = self.bot.get_channel(self.config.PRICE_CHANNEL_ID)
+        if channel is None:
+            channel = await self.bot.fetch_channel(self.config.PRICE_CHANNEL_ID)
+        return channel
 
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info(f'LiveMarketCog ready as {self.bot.user}')
-        channel = self.bot.get_channel(self.config.PRICE_CHANNEL_ID)
-        if channel is None:
+        if not self.attached:
             try:
-                channel = await self.bot.fetch_channel(self.config.PRICE_CHANNEL_ID)
+                channel = await self.get_market_channel()
             except Exception as e:
                 logger.error(f"Error fetching channel: {e}")
                 return
-        await self.clear_market_channel(channel)
+            await self.attach_market_messages(channel)
         if not self.update_price_tracker.is_running():
             self.update_price_tracker.start()
 
+    async def attach_market_messages(self, channel: discord.TextChannel):
+        state = await asyncio.to_thread(read_json, self.state_path, {})
+        message_ids = state.get("message_ids", []) if state.get("channel_id") == channel.id else []
+        self.page_messages = []
+        for message_id in message_ids:
+            try:
+                self.page_messages.append(await channel.fetch_message(message_id))
+            except discord.NotFound:
+                self.page_messages.append(None)
+            except Exception as e:
+                logger.error(f"Error fetching market message {message_id}: {e}")
+                self.page_messages.append(None)
+        self.page_fingerprints = [None] * len(self.page_messages)
+        self.attached = True
+        attached = sum(message is not None for message in self.page_messages)
+        logger.info(f"Reattached {attached}/{len(message_ids)} market messages in channel {channel.id}")
+        await self.remove_stray_messages(channel)
+
+    async def remove_stray_messages(self, channel: discord.TextChannel):
+        keep = {message.id for message in self.page_messages if message is not None}
+        try:
+            deleted = await self.bot.outbound.submit(
+                ("channel", channel.id),
+                lambda: channel.purge(limit=100, check=lambda msg: msg.id not in keep, bulk=True),
+                BACKGROUND
+            )
+            if deleted:
+                logger.info(f"Removed {len(deleted)} stray messages from channel {channel.id}")
+        except Exception as e:
+            logger.error(f"Error removing stray messages: {e}")
+
+    async def save_market_state(self, channel_id):
+        state = {
+            "channel_id": channel_id,
+            "message_ids": [message.id if message is not None else None for message in self.page_messages]
+        }
+        try:
+            await asyncio.to_thread(write_json, self.state_path, state)
+        except Exception as e:
+            logger.error(f"Error saving market state: {e}")
+
     async def clear_market_channel(self, channel: discord.TextChannel):
         try:
             pinned_messages = await channel.pins()
@@ -40,105 +147,260 @@ class LiveMarketCog(commands.Cog):
                     await msg.unpin()
                 except Exception as e:
                     logger.error(f"Error unpinning message {msg.id}: {e}")
+            deletions = [self.bot.outbound.delete(msg) async for msg in channel.history(limit=None)]
+            results = await asyncio.gather(*deletions, return_exceptions=True)
             deleted_count = 0
-            async for msg in channel.history(limit=None):
-                try:
-                    await msg.delete()
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error deleting message: {result}")
+                else:
                     deleted_count += 1
-                except Exception as e:
-                    logger.error(f"Error deleting message {msg.id}: {e}")
             logger.info(f"Cleared {deleted_count} messages from channel {channel.id}")
-            self.price_message = None
+            self.page_messages = []
+            self.page_fingerprints = []
+            await self.save_market_state(channel.id)
         except Exception as e:
             logger.error(f"Error clearing channel: {e}")
 
-    @tasks.loop(minutes=1)
-    async def update_price_tracker(self):
-        channel = self.bot.get_channel(self.config.PRICE_CHANNEL_ID)
-        if channel is None:
-            try:
-                channel = await self.bot.fetch_channel(self.config.PRICE_CHANNEL_ID)
-            except Exception as e:
-                logger.error(f"Error fetching channel during update: {e}")
-                return
+    @app_commands.command(name="resetmarket", description="Wipe the market channel and repost the market board.")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def reset_market(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
         try:
-            async with aiohttp.ClientSession() as session:
-                for item_key, item_data in MONITORED_ITEMS.items():
-                    try:
-                        params = {
-                            "item_id": item_data["id"],
-                            "limit": 3,
-                            "sort": "price",
-                            "order": "desc",
-                            "condense": "true"
-                        }
-                        if "rarity" in item_data:
-                            params["rarity"] = item_data["rarity"]
-                        async with session.get(
-                            f"{self.config.BASE_URL}/market",
-                            params=params,
-                            headers=self.config.HEADERS
-                        ) as response:
-                            data = await response.json()
-                            if data["status"] == "OK" and data["body"]:
-                                listings = data["body"]
-                                if listings:
-                                    current_price = listings[0]['price']
-                                    self.price_history[item_key].append(current_price)
-                                    self.current_prices[item_key] = current_price
-                    except Exception as e:
-                        logger.error(f"Error fetching {item_data['name']}: {e}")
-                        continue
+            channel = await self.get_market_channel()
+        except Exception as e:
+            await interaction.followup.send(f"Market channel not found: {e}", ephemeral=True)
+            return
+        async with self.publish_lock:
+            await self.clear_market_channel(channel)
+            await self.publish_pages(channel, self.build_market_embeds(self.population_str))
+        await interaction.followup.send("Market channel reset.", ephemeral=True)
 
-                try:
-                    async with session.get("https://api.darkerdb.com/v1/population") as pop_response:
-                        pop_data = await pop_response.json()
-                        if pop_data.get("status") == "OK" and pop_data.get("body"):
-                            pop_body = pop_data["body"]
-                            num_online = pop_body.get("num_online", "N/A")
-                            num_lobby = pop_body.get("num_lobby", "N/A")
-                            num_dungeon = pop_body.get("num_dungeon", "N/A")
-                            population_str = f"**Online:** {num_online}   **Lobby:** {num_lobby}   **Dungeon:** {num_dungeon}"
-                        else:
-                            population_str = "*No population data*"
-                except Exception as e:
-                    logger.error(f"Error fetching population data: {e}")
-                    population_str = "*No population data*"
+    async def fetch_item_price(self, item_data, semaphore):
+        params = {
+            "item_id": item_data["id"],
+            "limit": 3,
+            "sort": "price",
+            "order": "desc",
+            "condense": "true"
+        }
+        if "rarity" in item_data:
+            params["rarity"] = item_data["rarity"]
+        async with semaphore:
+            data = await asyncio.wait_for(
+                self.bot.api.get_json("/market", params=params),
+                timeout=self.config.MARKET_REQUEST_TIMEOUT
+            )
+        if data["status"] == "OK" and data["body"]:
+            return data["body"][0]['price']
+        return None
+
+    async def fetch_population(self, semaphore):
+        async with semaphore:
+            pop_data = await asyncio.wait_for(
+                self.bot.api.get_json("/population"),
+                timeout=self.config.MARKET_REQUEST_TIMEOUT
+            )
+        if pop_data.get("status") == "OK" and pop_data.get("body"):
+            pop_body = pop_data["body"]
+            num_online = pop_body.get("num_online", "N/A")
+            num_lobby = pop_body.get("num_lobby", "N/A")
+            num_dungeon = pop_body.get("num_dungeon", "N/A")
+            return f"**Online:** {num_online}   **Lobby:** {num_lobby}   **Dungeon:** {num_dungeon}"
+        return "*No population data*"
+
+    def due_items(self, now):
+        return [item_key for item_key in self.watchlist if self.next_poll[item_key] <= now]
+
+    def schedule_item(self, item_key, moved, now):
+        if moved:
+            interval = self.config.MARKET_MIN_POLL
+        else:
+            interval = min(self.poll_intervals[item_key] * 2, self.config.MARKET_MAX_POLL)
+        self.poll_intervals[item_key] = interval
+        # Poll slightly early so an item due on the next tick is not pushed back a whole interval
+        self.next_poll[item_key] = now + interval - 1
+
+    async def refresh_prices(self):
+        now = time.monotonic()
+        semaphore = asyncio.Semaphore(self.config.MARKET_CONCURRENCY)
+        item_keys = self.due_items(now)
+        results = await asyncio.gather(
+            *(self.fetch_item_price(self.watchlist[key], semaphore) for key in item_keys),
+            self.fetch_population(semaphore),
+            return_exceptions=True
+        )
+        changed = 0
+        observed = {}
+        for item_key, result in zip(item_keys, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error fetching {self.watchlist[item_key]['name']}: {result!r}")
+                self.stale_items.add(item_key)
+                self.schedule_item(item_key, True, now)
+                continue
+            self.stale_items.discard(item_key)
+            moved = result is not None and result != self.current_prices.get(item_key)
+            if result is not None:
+                series = self.price_series[item_key]
+                series.push(time.time(), result)
+                observed[item_key] = {
+                    "price": result,
+                    "change_1h": series.change_short,
+                    "change_24h": series.change_long
+                }
+            if moved:
+                changed += 1
+                self.current_prices[item_key] = result
+            self.schedule_item(item_key, moved, now)
+        alerts = self.bot.get_cog("AlertsCog")
+        if alerts is not None:
+            alerts.check_prices(observed)
+        population_str = results[-1]
+        if isinstance(population_str, BaseException):
+            logger.error(f"Error fetching population data: {population_str!r}")
+        else:
+            self.population_str = population_str
+        return len(item_keys), changed
+
+    def fingerprint(self, embed):
+        data = embed.to_dict()
+        data.pop("timestamp", None)
+        data.pop("footer", None)
+        data["fields"] = [field for field in data.get("fields", []) if field["name"] != "Population"]
+        return hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=16).digest()
+
+    def format_change(self, change):
+        return f"{change:+.1f}%" if change is not None else "–"
+
+    def format_item(self, item_key):
+        current_price = self.current_prices.get(item_key)
+        series = self.price_series[item_key]
+        trend = {1: "🟢↑", -1: "🔴↓"}.get(series.direction, "➖")
+        if not current_price:
+            value = "*No data*"
+        else:
+            value = f"**{trend} {current_price:g}g**"
+            if len(series) > 1:
+                value += (
+                    f"\nEMA {series.ema:.0f} · {series.low:g}–{series.high:g}"
+                    f"\n1h {self.format_change(series.change_short)} · 24h {self.format_change(series.change_long)}"
+                )
+                if series.volatility is not None:
+                    value += f" · σ {series.volatility:.1f}%"
+        if item_key in self.stale_items:
+            value += " *(stale)*"
+        return value
 
+    def build_market_embeds(self, population_str):
+        items = list(self.watchlist.items())
+        pages = [items[i:i + ITEMS_PER_EMBED] for i in range(0, len(items), ITEMS_PER_EMBED)] or [[]]
+        min_poll = self.config.MARKET_MIN_POLL // 60
+        max_poll = self.config.MARKET_MAX_POLL // 60
+        embeds = []
+        for index, page in enumerate(pages):
+            title = "📊 Market Watch" if len(pages) == 1 else f"📊 Market Watch ({index + 1}/{len(pages)})"
             embed = discord.Embed(
-                title="📊 Market Watch",
-                description="Live prices (1 min updates)",
+                title=title,
+                description="Live prices (updated when they move)",
                 color=0x2b2d31,
                 timestamp=datetime.now()
             )
-            items = list(MONITORED_ITEMS.values())
-            for i in range(0, len(items), 3):
-                row = items[i:i+3]
-                for item in row:
-                    item_key = item["name"].lower().replace(" ", "_")
-                    current_price = self.current_prices.get(item_key)
-                    trend = "➖"
-                    history = list(self.price_history.get(item_key, []))
-                    if len(history) > 1:
-                        if history[-1] > history[-2]:
-                            trend = "🟢↑"
-                        elif history[-1] < history[-2]:
-                            trend = "🔴↓"
-                    value = f"**{trend} {current_price}g**" if current_price else "*No data*"
-                    embed.add_field(name=f"__{item['name']}__", value=value, inline=True)
-                while len(row) < 3:
+            for i in range(0, len(page), 3):
+                row = page[i:i+3]
+                for item_key, item in row:
+                    embed.add_field(name=f"__{item['name']}__", value=self.format_item(item_key), inline=True)
+                for _ in range(3 - len(row)):
                     embed.add_field(name="\u200b", value="\u200b", inline=True)
-                    row.append(None)
-            embed.add_field(name="Population", value=population_str, inline=False)
-            embed.set_footer(text=f"Next update: {(datetime.now() + timedelta(minutes=1)).strftime('%H:%M')}")
-            if self.price_message:
-                try:
-                    await self.price_message.edit(embed=embed)
-                except discord.NotFound:
-                    self.price_message = await channel.send(embed=embed)
+            if index == 0:
+                embed.add_field(name="Population", value=population_str, inline=False)
+            embed.set_footer(text=f"Checked every {min_poll}-{max_poll} min")
+            embeds.append(embed)
+        return embeds
+
+    async def publish_page(self, channel, index, embed):
+        outbound = self.bot.outbound
+        message = self.page_messages[index] if index < len(self.page_messages) else None
+        if message is not None:
+            try:
+                await outbound.edit(message, priority=BACKGROUND, embed=embed)
+                return
+            except discord.NotFound:
+                pass
+        message = await outbound.send(channel, priority=BACKGROUND, embed=embed)
+        while len(self.page_messages) <= index:
+            self.page_messages.append(None)
+        self.page_messages[index] = message
+        try:
+            await outbound.submit(("pins", channel.id), message.pin, BACKGROUND)
+        except Exception as e:
+            logger.error(f"Error pinning market message {message.id}: {e}")
+
+    async def drop_extra_pages(self, page_count):
+        extra = [message for message in self.page_messages[page_count:] if message is not None]
+        del self.page_messages[page_count:]
+        del self.page_fingerprints[page_count:]
+        results = await asyncio.gather(*(self.bot.outbound.delete(message) for message in extra), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, discord.NotFound):
+                logger.error(f"Error deleting extra market page: {result}")
+
+    async def publish_pages(self, channel, embeds):
+        now = time.monotonic()
+        message_ids = [message.id if message is not None else None for message in self.page_messages]
+        if len(self.page_messages) > len(embeds):
+            await self.drop_extra_pages(len(embeds))
+        force_population = now - self.last_edit >= self.config.MARKET_MAX_POLL
+        while len(self.page_fingerprints) < len(embeds):
+            self.page_fingerprints.append(None)
+        updates = []
+        fingerprints = []
+        for index, embed in enumerate(embeds):
+            fingerprint = self.fingerprint(embed)
+            has_message = index < len(self.page_messages) and self.page_messages[index] is not None
+            if has_message and fingerprint == self.page_fingerprints[index] and not (index == 0 and force_population):
+                continue
+            fingerprints.append((index, fingerprint))
+            updates.append(self.publish_page(channel, index, embed))
+        if not updates:
+            logger.debug("Market embeds unchanged, skipping edits")
+            return
+        self.last_edit = now
+        results = await asyncio.gather(*updates, return_exceptions=True)
+        for (index, fingerprint), result in zip(fingerprints, results):
+            if isinstance(result, Exception):
+                # Leave the old fingerprint so the next tick retries this page
+                logger.error(f"Error publishing market page {index + 1}: {result}")
             else:
-                self.price_message = await channel.send(embed=embed)
+                self.page_fingerprints[index] = fingerprint
+        if [message.id if message is not None else None for message in self.page_messages] != message_ids:
+            await self.save_market_state(channel.id)
+        logger.info(f"Updated {len(updates)}/{len(embeds)} market pages")
+
+    @tasks.loop(seconds=Config.MARKET_MIN_POLL)
+    async def update_price_tracker(self):
+        try:
+            channel = await self.get_market_channel()
+        except Exception as e:
+            logger.error(f"Error fetching channel during update: {e}")
+            return
+        try:
+            tick_start = time.perf_counter()
+            polled, changed = await self.refresh_prices()
+            self.last_tick_duration = time.perf_counter() - tick_start
+            TICK_SECONDS.labels("live_market", "update_price_tracker").observe(self.last_tick_duration)
+            logger.info(
+                f"Market tick polled {polled}/{len(self.watchlist)} items in {self.last_tick_duration:.2f}s "
+                f"({changed} moved, {len(self.stale_items)} stale)"
+            )
+            if self.last_tick_duration > self.config.MARKET_MIN_POLL / 2:
+                logger.warning(f"Market tick took {self.last_tick_duration:.2f}s, over half the update interval")
+            async with self.publish_lock:
+                await self.publish_pages(channel, self.build_market_embeds(self.population_str))
+            if time.monotonic() - self.last_indicator_save >= INDICATOR_SAVE_INTERVAL:
+                await self.save_indicators()
         except Exception as e:
+            TICK_ERRORS.labels("live_market", "update_price_tracker").inc()
             logger.error(f"Error in price tracker: {e}")
 
     @update_price_tracker.before_loop
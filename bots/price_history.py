@@ -2,16 +2,24 @@
 import os
 import json
 import asyncio
-import requests
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-from datetime import datetime, timedelta
+import logging
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from discord.ui import View, Select, Button, Modal, TextInput
 from dotenv import load_dotenv
+from common.config import Config
+from common.charts import ChartRenderer, filter_outliers_iqr, to_candle_arrays
+from common.cache import LRUCache
+from common.metrics import QUEUE_DEPTH, track_cache, untrack_cache
+from common.outbound import INTERACTIVE
+from common.search import ItemSearchIndex
+from common.catalog import load_catalog
+from common.history_store import PriceHistoryStore, sync_price_history
+
+logger = logging.getLogger('DarkAndDarkerDB.PriceHistory')
 
 class PriceHistoryCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -20,8 +28,9 @@ class PriceHistoryCog(commands.Cog):
         self.DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
         self.DARKERDB_API_KEY = os.getenv("DARKERDB_API_KEY")
         self.MARKET_HISTORY_ID = os.getenv("MARKET_HISTORY_ID")
-        with open("item_ids.json", "r") as f:
-            self.ITEM_IDS = json.load(f)
+        self.ITEM_IDS = []
+        self.search_index = ItemSearchIndex(self.ITEM_IDS)
+        self.catalog_mtime = None
         self.RARITY_MAPPING = {
             "1001": "Poor",
             "2001": "Common",
@@ -32,108 +41,93 @@ class PriceHistoryCog(commands.Cog):
             "7001": "Unique"
         }
         self.RARITY_MAPPING_REV = {v: k for k, v in self.RARITY_MAPPING.items()}
+        self.ATTRIBUTES = {}
+        self.history_store = None
+        self.chart_renderer = None
+        self.chart_cache = LRUCache(max_entries=Config.CHART_CACHE_ENTRIES, max_bytes=Config.CHART_CACHE_BYTES)
+        self.strictness_multiplier = 0.7
+
+    def read_item_ids(self):
+        with open("item_ids.json", "r") as f:
+            item_ids = json.load(f)
+        return item_ids, ItemSearchIndex(item_ids)
+
+    async def cog_load(self):
+        self.ITEM_IDS, self.search_index = await asyncio.to_thread(self.read_item_ids)
+        self.chart_renderer = ChartRenderer(max_workers=Config.CHART_WORKERS)
+        track_cache("charts", self.chart_cache)
+        QUEUE_DEPTH.set_function(lambda: self.chart_renderer.waiting, queue="chart_renderer")
+        self.history_store = PriceHistoryStore(
+            os.path.join(Config.DATA_DIR, "price_history.sqlite3"),
+            retention_days=Config.HISTORY_RETENTION_DAYS,
+            max_series=Config.HISTORY_MAX_SERIES
+        )
+        self.watch_catalog.start()
         try:
-            attr_resp = requests.get("https://api.darkerdb.com/v1/items/attributes")
-            attr_resp.raise_for_status()
-            self.ATTRIBUTES = {a["id"]: a for a in attr_resp.json()["body"]}
+            attr_data = await self.bot.api.get_json("/items/attributes")
+            self.ATTRIBUTES = {a["id"]: a for a in attr_data["body"]}
         except Exception:
             self.ATTRIBUTES = {}
-        self.strictness_multiplier = 0.7
 
-    async def async_requests_get(self, url, **kwargs):
-        return await asyncio.to_thread(requests.get, url, **kwargs)
+    async def cog_unload(self):
+        self.watch_catalog.cancel()
+        untrack_cache("charts")
+        QUEUE_DEPTH.remove_function(queue="chart_renderer")
+        if self.chart_renderer is not None:
+            self.chart_renderer.shutdown()
+        if self.history_store is not None:
+            self.history_store.close()
 
-    def compute_thresholds(self, values, multiplier=1.5, lower_percentile=25, upper_percentile=75):
-        q1 = np.percentile(values, lower_percentile)
-        q3 = np.percentile(values, upper_percentile)
-        iqr = q3 - q1
-        lower_bound = q1 - (multiplier * iqr)
-        upper_bound = q3 + (multiplier * iqr)
-        return lower_bound, upper_bound
+    def read_catalog(self):
+        catalog = load_catalog(Config.CATALOG_PATH)
+        item_ids = [item["id"] for item in catalog]
+        return catalog, item_ids, ItemSearchIndex(item_ids)
 
-    def filter_outliers_iqr(self, data):
-        if not data:
-            return []
-        max_values = [d["max"] for d in data]
-        min_values = [d["min"] for d in data]
-        min_bound_max, max_bound_max = self.compute_thresholds(
-            max_values, multiplier=self.strictness_multiplier, lower_percentile=35, upper_percentile=75)
-        min_bound_min, max_bound_min = self.compute_thresholds(
-            min_values, multiplier=self.strictness_multiplier, lower_percentile=35, upper_percentile=75)
-        iqr_filtered = [d for d in data if d["max"] <= max_bound_max and d["min"] >= min_bound_min]
-        final_filtered = [d for d in iqr_filtered if d["avg"] != 0 and d["max"] <= 3 * d["avg"]]
-        return final_filtered
+    @tasks.loop(seconds=60)
+    async def watch_catalog(self):
+        try:
+            mtime = os.path.getmtime(Config.CATALOG_PATH)
+        except OSError:
+            return
+        if mtime == self.catalog_mtime:
+            return
+        try:
+            catalog, item_ids, search_index = await asyncio.to_thread(self.read_catalog)
+        except Exception as e:
+            logger.error(f"Error reloading item catalog: {e}")
+            return
+        self.catalog_mtime = mtime
+        if not item_ids:
+            return
+        self.ITEM_IDS = item_ids
+        self.search_index = search_index
+        self.bot.items.seed(catalog, mtime)
+        logger.info(f"Loaded {len(item_ids)} items from {Config.CATALOG_PATH}")
 
-    def generate_chart(self, market_data, item_name=None):
-        plt.style.use('dark_background')
-        fig, ax = plt.subplots(figsize=(30, 16), dpi=100)
-        bar_width = 0.5
-        candles = []
-        for i, d in enumerate(market_data):
-            open_val = d["avg"] if i == 0 else market_data[i-1]["avg"]
-            close_val = d["avg"]
-            candles.append({
-                "timestamp": d["timestamp"],
-                "open": open_val,
-                "high": d["max"],
-                "low": d["min"],
-                "close": close_val,
-                "volume": d["volume"]
-            })
-        for i, candle in enumerate(candles):
-            o, c, h, l = candle["open"], candle["close"], candle["high"], candle["low"]
-            color = 'green' if c >= o else 'red'
-            body_bottom = min(o, c)
-            body_top = max(o, c)
-            body_height = abs(o - c)
-            ax.bar(i, body_height, bar_width, bottom=body_bottom, color=color)
-        
-        ax.set_axisbelow(True)
-        ax.yaxis.grid(True, linestyle=':', color='grey')
-        
-        day_ticks = []
-        day_labels = []
-        current_date = None
-        for i, candle in enumerate(candles):
-            dt = datetime.strptime(candle["timestamp"], "%Y-%m-%dT%H:%M:%SZ")
-            if current_date is None or dt.date() != current_date:
-                current_date = dt.date()
-                day_ticks.append(i)
-                day_labels.append(dt.strftime('%m/%d %a'))
-        
-        for tick in day_ticks:
-            ax.axvline(x=tick, color='grey', linestyle='--', alpha=0.3)
-        
-        ax.set_xticks(day_ticks)
-        ax.set_xticklabels(day_labels, rotation=45, fontsize=16)
-        ax.set_xlabel("Date", fontsize=20)
-        ax.set_ylabel("Price", fontsize=20)
-        
-        if item_name:
-            ax.set_title(f"{item_name} 2 Week Candle Chart", fontsize=24)
-        else:
-            ax.set_title("2 Week Candle Chart", fontsize=24)
-        
-        legend_elements = [
-            Patch(facecolor='green', label='Price Increase (Close ≥ Open)'),
-            Patch(facecolor='red', label='Price Decrease (Close < Open)')
-        ]
-        ax.legend(handles=legend_elements, fontsize=16)
-        
-        if market_data:
-            global_min = min(d["min"] for d in market_data)
-            global_max = max(d["max"] for d in market_data)
-            buffer = (global_max - global_min) * 0.1
-            ax.set_ylim(global_min - buffer, global_max + buffer)
-        
-        ax.text(0.01, 0.99, "Powered by darkerdb.com", transform=ax.transAxes,
-                fontsize=10, color='grey', verticalalignment='top')
-        
-        plt.tight_layout()
-        image_path = "chart.png"
-        plt.savefig(image_path)
-        plt.close(fig)
-        return image_path
+    def filter_outliers_iqr(self, candles):
+        return filter_outliers_iqr(candles, multiplier=self.strictness_multiplier)
+
+    async def generate_chart(self, candles, item_name=None):
+        return await self.chart_renderer.render(candles, item_name=item_name)
+
+    async def build_history_chart(self, item_id, item_name, secondary=None):
+        now = datetime.now(timezone.utc)
+        latest_bucket = now.replace(minute=now.minute - now.minute % 30, second=0, microsecond=0)
+        attribute, value = secondary if secondary else (None, None)
+        cache_key = (item_id, attribute, value, latest_bucket)
+        chart_png = self.chart_cache.get(cache_key)
+        if chart_png is not None:
+            logger.info(f"Chart cache hit for {cache_key} (hit ratio {self.chart_cache.hit_ratio:.0%})")
+            return chart_png
+        market_data = await sync_price_history(
+            self.bot.api, self.history_store, item_id, now - timedelta(days=16), secondary=secondary
+        )
+        if not market_data:
+            return None
+        filtered = self.filter_outliers_iqr(to_candle_arrays(market_data))
+        chart_png = await self.generate_chart(filtered, item_name=item_name)
+        self.chart_cache.set(cache_key, chart_png)
+        return chart_png
 
     ## ––– Inner UI Classes ––– ##
     from discord.ui import Select, View, Button, Modal, TextInput
@@ -141,12 +135,12 @@ class PriceHistoryCog(commands.Cog):
     class BaseItemSelect(Select):
         def __init__(self, base_items, cog):
             self.cog = cog
-            options = [discord.SelectOption(label=item) for item in base_items]
+            options = [discord.SelectOption(label=cog.search_index.display(item)[:100], value=item) for item in base_items]
             super().__init__(placeholder="Select an item", min_values=1, max_values=1, options=options)
         
         async def callback(self, interaction: discord.Interaction):
             self.view.selected_base = self.values[0]
-            available = [item for item in self.cog.ITEM_IDS if item.startswith(self.values[0] + "_")]
+            available = self.cog.search_index.full_ids(self.values[0])
             self.view.available_full_ids = available
             self.view.clear_items()
             if available and len(available) > 1:
@@ -160,7 +154,7 @@ class PriceHistoryCog(commands.Cog):
                     opts = [discord.SelectOption(label=r) for r in rarity_options]
                     self.view.add_item(self.cog.RaritySelect(opts, self.cog))
                     await interaction.response.edit_message(
-                        content=f"You selected: **{self.values[0]}**. Now choose a rarity.",
+                        content=f"You selected: **{self.cog.search_index.display(self.values[0])}**. Now choose a rarity.",
                         view=self.view
                     )
                     return
@@ -249,96 +243,35 @@ class PriceHistoryCog(commands.Cog):
                 await self.finalize(interaction)
 
         async def finalize(self, interaction: discord.Interaction):
-            now = datetime.now()
-            base_url = f"https://api.darkerdb.com/v1/market/analytics/{self.selected_full}/prices/history"
-            t1_from = (now - timedelta(days=4)).isoformat() + "Z"   # Interval 1: [now-4, now)
-            t2_from = (now - timedelta(days=8)).isoformat() + "Z"   # Interval 2: [now-8, now-4)
-            t3_from = (now - timedelta(days=12)).isoformat() + "Z"  # Interval 3: [now-12, now-8)
-            t4_from = (now - timedelta(days=16)).isoformat() + "Z"  # Interval 4: [now-16, now-12)
+            secondary = None
             if self.selected_modifier_value is not None and self.selected_secondary is not None:
-                modifier_field = self.selected_secondary
-                modifier_value = self.selected_modifier_value
-                params1 = {"interval": "30m", "from": t1_from, f"secondary[{modifier_field}]": modifier_value}
-                params2 = {"interval": "30m", "from": t2_from, "to": t1_from, f"secondary[{modifier_field}]": modifier_value}
-                params3 = {"interval": "30m", "from": t3_from, "to": t2_from, f"secondary[{modifier_field}]": modifier_value}
-                params4 = {"interval": "30m", "from": t4_from, "to": t3_from, f"secondary[{modifier_field}]": modifier_value}
-                try:
-                    market_resp1 = await self.cog.async_requests_get(base_url, params=params1)
-                    market_resp1.raise_for_status()
-                    data1 = market_resp1.json().get("body") or []
-                    market_resp2 = await self.cog.async_requests_get(base_url, params=params2)
-                    market_resp2.raise_for_status()
-                    data2 = market_resp2.json().get("body") or []
-                    market_resp3 = await self.cog.async_requests_get(base_url, params=params3)
-                    market_resp3.raise_for_status()
-                    data3 = market_resp3.json().get("body") or []
-                    market_resp4 = await self.cog.async_requests_get(base_url, params=params4)
-                    market_resp4.raise_for_status()
-                    data4 = market_resp4.json().get("body") or []
-                    market_data = data4 + data3 + data2 + data1
-                    market_data.sort(key=lambda x: x["timestamp"])
-                    if not market_data:
-                        await interaction.followup.send("No market history data available for this item with the modifier.", ephemeral=False)
-                        self.stop()
-                        return
-                except Exception:
-                    await interaction.followup.send("Error fetching market history data.", ephemeral=False)
-                    self.stop()
-                    return
-                item_name = self.item_details.get("name")
-                rarity = self.item_details.get("rarity")
-                filtered_data = self.cog.filter_outliers_iqr(market_data)
-                chart_path = self.cog.generate_chart(filtered_data, item_name=item_name)
-                details_msg = (
-                    f"**Item:** {item_name}\n"
-                    f"**Rarity:** {rarity}\n"
-                    f"**Modifier:** {self.selected_secondary.capitalize()} = {modifier_value}\n"
+                secondary = (self.selected_secondary, self.selected_modifier_value)
+            item_name = self.item_details.get("name")
+            try:
+                chart_png = await self.cog.build_history_chart(self.selected_full, item_name, secondary)
+            except Exception:
+                await interaction.followup.send("Error fetching market history data.", ephemeral=False)
+                self.stop()
+                return
+            if chart_png is None:
+                suffix = " with the modifier" if secondary else ""
+                await interaction.followup.send(f"No market history data available for this item{suffix}.", ephemeral=False)
+                self.stop()
+                return
+            details_msg = (
+                f"**Item:** {item_name}\n"
+                f"**Rarity:** {self.item_details.get('rarity')}\n"
+            )
+            if secondary:
+                details_msg += f"**Modifier:** {self.selected_secondary.capitalize()} = {self.selected_modifier_value}\n"
+            channel = interaction.client.get_channel(int(self.cog.MARKET_HISTORY_ID))
+            if channel:
+                await self.cog.bot.outbound.send(
+                    channel, priority=INTERACTIVE, content=details_msg,
+                    file=discord.File(BytesIO(chart_png), filename="chart.png")
                 )
-                channel = interaction.client.get_channel(int(self.cog.MARKET_HISTORY_ID))
-                if channel:
-                    await channel.send(content=details_msg, file=discord.File(chart_path))
-                else:
-                    await interaction.followup.send("Market history channel not found!", ephemeral=False)
             else:
-                params1 = {"interval": "30m", "from": t1_from}
-                params2 = {"interval": "30m", "from": t2_from, "to": t1_from}
-                params3 = {"interval": "30m", "from": t3_from, "to": t2_from}
-                params4 = {"interval": "30m", "from": t4_from, "to": t3_from}
-                try:
-                    market_resp1 = await self.cog.async_requests_get(base_url, params=params1)
-                    market_resp1.raise_for_status()
-                    data1 = market_resp1.json().get("body") or []
-                    market_resp2 = await self.cog.async_requests_get(base_url, params=params2)
-                    market_resp2.raise_for_status()
-                    data2 = market_resp2.json().get("body") or []
-                    market_resp3 = await self.cog.async_requests_get(base_url, params=params3)
-                    market_resp3.raise_for_status()
-                    data3 = market_resp3.json().get("body") or []
-                    market_resp4 = await self.cog.async_requests_get(base_url, params=params4)
-                    market_resp4.raise_for_status()
-                    data4 = market_resp4.json().get("body") or []
-                    market_data = data4 + data3 + data2 + data1
-                    market_data.sort(key=lambda x: x["timestamp"])
-                    if not market_data:
-                        await interaction.followup.send("No market history data available for this item.", ephemeral=False)
-                        self.stop()
-                        return
-                except Exception:
-                    await interaction.followup.send("Error fetching market history data.", ephemeral=False)
-                    self.stop()
-                    return
-                filtered_data = self.cog.filter_outliers_iqr(market_data)
-                item_name = self.item_details.get("name")
-                chart_path = self.cog.generate_chart(filtered_data, item_name=item_name)
-                details_msg = (
-                    f"**Item:** {item_name}\n"
-                    f"**Rarity:** {self.item_details.get('rarity')}\n"
-                )
-                channel = interaction.client.get_channel(int(self.cog.MARKET_HISTORY_ID))
-                if channel:
-                    await channel.send(content=details_msg, file=discord.File(chart_path))
-                else:
-                    await interaction.followup.send("Market history channel not found!", ephemeral=False)
+                await interaction.followup.send("Market history channel not found!", ephemeral=False)
             self.stop()
 
     class SecondaryAttributeSelect(Select):
@@ -394,30 +327,25 @@ class PriceHistoryCog(commands.Cog):
             self.add_item(cog.BaseItemSelect(base_items, cog))
         
         async def fetch_item_details(self, full_id: str):
-            url = f"https://api.darkerdb.com/v1/items/{full_id}?condense=true"
-            try:
-                resp = await self.cog.async_requests_get(url)
-                resp.raise_for_status()
-                return resp.json()["body"]
-            except Exception:
-                return {}
+            return await self.cog.bot.items.get(full_id) or {}
 
     @app_commands.command(name="find", description="Find market history and modifiers for an item.")
     @app_commands.describe(itemname="The item name to search for (e.g., Sapphire)")
     async def find(self, interaction: discord.Interaction, itemname: str):
-        search_term = itemname.lower()
-        matches = {}
-        for full in self.ITEM_IDS:
-            base = full.split("_")[0] if "_" in full else full
-            if search_term in base.lower():
-                matches[base] = True
-        if not matches:
+        base_items = self.search_index.search(itemname, limit=25)
+        if not base_items:
             await interaction.response.send_message("No matching items found.", ephemeral=True)
             return
-        base_items = list(matches.keys())
         view = self.FindView(base_items, self)
         await interaction.response.send_message("Select an item from the list below:", view=view, ephemeral=True)
 
+    @find.autocomplete("itemname")
+    async def itemname_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=self.search_index.display(base)[:100], value=base)
+            for base in self.search_index.search(current, limit=25)
+        ]
+
     @commands.Cog.listener()
     async def on_ready(self):
         await self.bot.tree.sync()
@@ -1,18 +1,21 @@
 # bots/trade_history.py
+import time
+import asyncio
 import discord
 from discord import app_commands, ui
 from discord.ext import commands
-import aiohttp
 import logging
 from datetime import datetime
 import pytz
 from urllib.parse import urlparse, parse_qs
 from common.config import Config
+from common.cache import LRUCache
+from common.metrics import track_cache
 from common.constants import RARITY_EMOJIS, RARITY_COLORS
 
 logger = logging.getLogger('DarkAndDarkerDB.TradeHistory')
 
-async def fetch_trade_history(session, username, config, limit=50, cursor=None):
+async def fetch_trade_history(api, username, limit=50, cursor=None):
     params = {k: v for k, v in {
         "seller": username,
         "limit": limit,
@@ -20,22 +23,19 @@ async def fetch_trade_history(session, username, config, limit=50, cursor=None):
         "condense": "true"
     }.items() if v is not None}
     logger.info(f"Fetching trades with params: {params}")
-    async with session.get(f"{config.BASE_URL}/market", params=params, headers=config.HEADERS) as response:
-        if response.status != 200:
-            raise Exception(f"API returned status code {response.status}")
-        data = await response.json()
-        logger.info(f"API response status: {data['status']}")
-        if data["status"] == "OK":
-            return data["body"], data["pagination"]
-        else:
-            raise Exception(f"API Error: {data['status']}")
+    data = await api.get_json("/market", params=params)
+    logger.info(f"API response status: {data['status']}")
+    if data["status"] == "OK":
+        return data["body"], data["pagination"]
+    else:
+        raise Exception(f"API Error: {data['status']}")
 
-async def get_all_trades(session, username, config):
+async def get_all_trades(api, username):
     all_trades = []
     cursor = None
     while True:
         try:
-            trades, pagination = await fetch_trade_history(session, username, config, cursor=cursor)
+            trades, pagination = await fetch_trade_history(api, username, cursor=cursor)
             logger.debug(f"Current cursor: {cursor}")
         except Exception as e:
             logger.error(f"Error during fetch: {e}")
@@ -45,18 +45,159 @@ async def get_all_trades(session, username, config):
             break
         all_trades.extend(trades)
         logger.info(f"Fetched {len(trades)} trades, total so far: {len(all_trades)}")
-        next_url = pagination.get("next")
-        if not next_url:
-            logger.info("No next page, exiting loop.")
-            break
-        parsed_url = urlparse(next_url)
-        query_params = parse_qs(parsed_url.query)
-        cursor = query_params.get("cursor", [None])[0]
+        cursor = next_cursor(pagination)
         if not cursor:
-            logger.info("No cursor found, exiting loop.")
+            logger.info("No next page, exiting loop.")
             break
     return all_trades
 
+def next_cursor(pagination):
+    next_url = (pagination or {}).get("next")
+    if not next_url:
+        return None
+    query_params = parse_qs(urlparse(next_url).query)
+    return query_params.get("cursor", [None])[0]
+
+def trade_key(trade):
+    return trade.get("id") or (trade.get("item_id"), trade.get("price"), trade.get("expires_at"))
+
+class SellerHistory:
+    def __init__(self, username):
+        self.username = username
+        self.trades = []
+        self.keys = set()
+        self.cursor = None
+        self.complete = False
+        self.fetched_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def append(self, trades):
+        for trade in trades:
+            key = trade_key(trade)
+            if key not in self.keys:
+                self.keys.add(key)
+                self.trades.append(trade)
+
+    def prepend(self, trades):
+        fresh = [trade for trade in trades if trade_key(trade) not in self.keys]
+        self.keys.update(trade_key(trade) for trade in fresh)
+        self.trades[:0] = fresh
+        return len(fresh)
+
+class SellerTradeCache:
+    def __init__(self, api, ttl=300, max_sellers=200, max_rows=50000, max_rows_per_seller=5000, api_page_size=50):
+        self.api = api
+        self.ttl = ttl
+        self.max_rows_per_seller = max_rows_per_seller
+        self.api_page_size = api_page_size
+        self.entries = LRUCache(max_entries=max_sellers, max_bytes=max_rows, sizeof=lambda h: len(h.trades))
+        self.refreshes = 0
+        self.crawls = 0
+        self.crawl_time = 0.0
+
+    def stats(self):
+        return {
+            "sellers": len(self.entries),
+            "rows": self.entries.total_bytes,
+            "hits": self.entries.hits,
+            "misses": self.entries.misses,
+            "hit_ratio": self.entries.hit_ratio,
+            "refreshes": self.refreshes,
+            "crawls": self.crawls,
+            "avg_crawl_seconds": self.crawl_time / self.crawls if self.crawls else 0.0
+        }
+
+    async def fetch_page(self, username, cursor):
+        start = time.perf_counter()
+        try:
+            trades, pagination = await fetch_trade_history(self.api, username, limit=self.api_page_size, cursor=cursor)
+        finally:
+            self.crawls += 1
+            self.crawl_time += time.perf_counter() - start
+        trades = trades or []
+        return trades, next_cursor(pagination) if trades else None
+
+    async def get(self, username):
+        history = self.entries.get(username)
+        if history is None:
+            history = SellerHistory(username)
+            await self.extend(history)
+        elif time.time() - history.fetched_at > self.ttl:
+            await self.refresh(history)
+        self.entries.set(username, history)
+        return history
+
+    async def extend(self, history):
+        async with history.lock:
+            if history.complete:
+                return
+            trades, cursor = await self.fetch_page(history.username, history.cursor)
+            history.append(trades)
+            history.cursor = cursor
+            history.complete = cursor is None or len(history.trades) >= self.max_rows_per_seller
+            if not history.fetched_at:
+                history.fetched_at = time.time()
+        self.entries.set(history.username, history)
+
+    async def ensure_rows(self, history, count):
+        while len(history.trades) < count and not history.complete:
+            await self.extend(history)
+
+    async def refresh(self, history):
+        async with history.lock:
+            if time.time() - history.fetched_at <= self.ttl:
+                return
+            self.refreshes += 1
+            fetched = []
+            cursor = None
+            while True:
+                trades, cursor = await self.fetch_page(history.username, cursor)
+                fetched.extend(trades)
+                if not cursor or any(trade_key(trade) in history.keys for trade in trades):
+                    break
+                if len(fetched) >= self.max_rows_per_seller:
+                    break
+            if cursor and not any(trade_key(trade) in history.keys for trade in fetched):
+                # The gap was too large to bridge; start over from the new head
+                history.trades = []
+                history.keys = set()
+                history.append(fetched)
+                history.cursor = cursor
+                history.complete = len(history.trades) >= self.max_rows_per_seller
+            else:
+                added = history.prepend(fetched)
+                logger.info(f"Refreshed trades for {history.username}: {added} new")
+            history.fetched_at = time.time()
+
+class TradePager:
+    def __init__(self, cache, history):
+        self.cache = cache
+        self.history = history
+        self.api_page_size = cache.api_page_size
+        self.pending = None
+
+    @property
+    def known_rows(self):
+        return len(self.history.trades) if self.history.complete else None
+
+    def cached(self, index):
+        return self.history.complete or len(self.history.trades) >= (index + 1) * self.api_page_size
+
+    async def get(self, index):
+        end = (index + 1) * self.api_page_size
+        await self.cache.ensure_rows(self.history, end)
+        return self.history.trades[index * self.api_page_size:end]
+
+    def prefetch(self, index):
+        if self.cached(index) or (self.pending is not None and not self.pending.done()):
+            return
+        self.pending = asyncio.ensure_future(self.cache.ensure_rows(self.history, (index + 1) * self.api_page_size))
+        self.pending.add_done_callback(self.finish_prefetch)
+
+    def finish_prefetch(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error prefetching trades for {self.history.username}: {task.exception()}")
+
 def create_trade_embeds(trades, username, current_page, total_pages):
     embeds = []
     for trade in trades:
@@ -93,21 +234,33 @@ def create_trade_embeds(trades, username, current_page, total_pages):
     return embeds
 
 class MultiEmbedView(ui.View):
-    def __init__(self, all_trades, username, page_size=10):
+    def __init__(self, pager, username, page_size=10):
         super().__init__(timeout=300)
-        self.all_trades = all_trades
+        self.pager = pager
         self.username = username
         self.page_size = page_size
+        self.pages_per_fetch = pager.api_page_size // page_size
         self.current_page = 0
-        self.total_pages = ((len(all_trades) - 1) // page_size) + 1
+
+    @property
+    def total_pages(self):
+        rows = self.pager.known_rows
+        if rows is None:
+            return None
+        return max(1, ((rows - 1) // self.page_size) + 1)
 
     async def show_page(self, interaction: discord.Interaction):
-        start = self.current_page * self.page_size
-        end = start + self.page_size
-        page_trades = self.all_trades[start:end]
-        embeds = create_trade_embeds(page_trades, self.username, self.current_page + 1, self.total_pages)
+        api_index, slot = divmod(self.current_page, self.pages_per_fetch)
+        if not self.pager.cached(api_index) and not interaction.response.is_done():
+            await interaction.response.defer()
+        trades = await self.pager.get(api_index)
+        start = slot * self.page_size
+        page_trades = trades[start:start + self.page_size]
+        self.pager.prefetch(api_index + 1)
+        total_pages = self.total_pages
+        embeds = create_trade_embeds(page_trades, self.username, self.current_page + 1, total_pages or "?")
         self.children[0].disabled = (self.current_page == 0)
-        self.children[1].disabled = (self.current_page >= self.total_pages - 1)
+        self.children[1].disabled = total_pages is not None and self.current_page >= total_pages - 1
         if interaction.response.is_done():
             await interaction.edit_original_response(embeds=embeds, view=self)
         else:
@@ -127,24 +280,36 @@ class TradeHistoryCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.config = Config()
+        self.trade_cache = SellerTradeCache(
+            bot.api,
+            ttl=self.config.TRADE_CACHE_TTL,
+            max_sellers=self.config.TRADE_CACHE_SELLERS,
+            max_rows=self.config.TRADE_CACHE_ROWS
+        )
+        track_cache("trade_history", self.trade_cache.entries)
 
     @app_commands.command(name="tradehistory", description="Fetch trade history for a user")
     async def tradehistory(self, interaction: discord.Interaction, username: str):
         await interaction.response.defer()
         logger.info(f"Processing /tradehistory for username: {username}")
-        async with aiohttp.ClientSession() as session:
-            try:
-                trades = await get_all_trades(session, username, self.config)
-                logger.info(f"Retrieved {len(trades)} trades for {username}")
-            except Exception as e:
-                logger.error(f"Error fetching trades: {e}")
-                await interaction.followup.send(f"Failed to fetch trade history: {e}")
-                return
+        try:
+            history = await self.trade_cache.get(username)
+            pager = TradePager(self.trade_cache, history)
+            trades = await pager.get(0)
+            stats = self.trade_cache.stats()
+            logger.info(
+                f"Retrieved first {len(trades)} trades for {username} "
+                f"(cache hit ratio {stats['hit_ratio']:.0%}, avg crawl {stats['avg_crawl_seconds']:.2f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Error fetching trades: {e}")
+            await interaction.followup.send(f"Failed to fetch trade history: {e}")
+            return
         if not trades:
             await interaction.followup.send(f"No trade history found for {username}.")
             return
         try:
-            view = MultiEmbedView(trades, username)
+            view = MultiEmbedView(pager, username)
             await view.show_page(interaction)
         except Exception as e:
             logger.error(f"Error sending embeds: {e}")
@@ -1,10 +1,11 @@
 # bots/trading_post.py
 import os
+import asyncio
+import hashlib
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands, tasks
-from discord.ui import Button, View
-import aiohttp
+from discord.ui import Button, DynamicItem, View
 from datetime import datetime
 import logging
 import re
@@ -12,36 +13,107 @@ import time
 from typing import Optional, List
 from collections import deque
 from common.config import Config
+from common.api import DarkerDBError
+from common.outbound import INTERACTIVE, FEED, CoalescingEditQueue
+from common.deals import DealScanner, ListingRating, load_reference_prices, roll_ranges, score_rolls
+from common.listings import ListingStore
+from common.utils import read_json, write_json
+from common.metrics import REGISTRY, TICK_SECONDS, TICK_ERRORS, QUEUE_DEPTH
 
 logger = logging.getLogger('TradingPostBot')
 
+TRADES_SEEN = REGISTRY.counter("trading_post_trades_total", "New chat trades posted to the feed")
+DEALS_FLAGGED = REGISTRY.counter("trading_post_deals_total", "Listings flagged as deals")
+
+def trade_identity(trade: dict) -> str:
+    raw = f"{trade.get('timestamp')}\x1f{trade.get('sender')}\x1f{trade.get('message')}"
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+class TradeFeedState:
+    def __init__(self, path: str, max_recent: int = 1000):
+        self.path = path
+        self.high_water = None
+        self.recent = deque(maxlen=max_recent)
+        self.recent_set = set()
+
+    def seen(self, identity: str) -> bool:
+        return identity in self.recent_set
+
+    def remember(self, identity: str, timestamp: str):
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_set.discard(self.recent[0])
+        self.recent.append(identity)
+        self.recent_set.add(identity)
+        if self.high_water is None or timestamp > self.high_water:
+            self.high_water = timestamp
+
+    def load(self):
+        try:
+            state = read_json(self.path, {})
+        except Exception as e:
+            logger.error(f"Error loading trading post state: {e}")
+            return
+        self.high_water = state.get("high_water")
+        for identity in state.get("recent", [])[-self.recent.maxlen:]:
+            self.recent.append(identity)
+        self.recent_set = set(self.recent)
+
+    def snapshot(self) -> dict:
+        return {"high_water": self.high_water, "recent": list(self.recent)}
+
+    def write(self, snapshot: dict):
+        write_json(self.path, snapshot, separators=(",", ":"))
+
 class TradingPostCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         load_dotenv()
         self.config = Config()
-        self.last_trade_time = None
-        self.item_cache = {}
+        self.feed_state = TradeFeedState(os.path.join(self.config.DATA_DIR, "trading_post_state.json"))
+        self.listings = None
+        self.use_from_param = True
         self.active_messages = deque(maxlen=200)
-        self.message_update_queue = deque(maxlen=50)
+        self.message_update_queue = CoalescingEditQueue(bot.outbound, max_pending=200, priority=INTERACTIVE)
+        self.reported_edit_stats = None
+        self.deals = DealScanner(
+            bot.items,
+            self.reference_prices,
+            roll_threshold=self.config.DEAL_ROLL_THRESHOLD,
+            discount_threshold=self.config.DEAL_DISCOUNT
+        )
+
+    async def cog_load(self):
+        await asyncio.to_thread(self.feed_state.load)
+        self.listings = await asyncio.to_thread(
+            ListingStore, os.path.join(self.config.DATA_DIR, "listings.sqlite3"), self.config.LISTING_STORE_ROWS
+        )
+        self.bot.add_dynamic_items(ItemStatsButton)
+        QUEUE_DEPTH.set_function(lambda: len(self.message_update_queue), queue="message_update_queue")
+
+    async def cog_unload(self):
+        self.monitor_trading_post.cancel()
+        self.process_message_queue.cancel()
+        self.bot.remove_dynamic_items(ItemStatsButton)
+        QUEUE_DEPTH.remove_function(queue="message_update_queue")
+        if self.listings is not None:
+            self.listings.close()
 
     async def get_item_data(self, item_id: str) -> Optional[dict]:
-        if item_id in self.item_cache:
-            return self.item_cache[item_id]
-        try:
-            async with aiohttp.ClientSession() as session:
-                archetype = item_id.split('_')[0]
-                url = f"{self.config.BASE_URL}/items?archetype={archetype}"
-                async with session.get(url, headers=self.config.HEADERS) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data["status"] == "OK" and data["body"]:
-                            for item in data["body"]:
-                                self.item_cache[item["id"]] = item
-                            return self.item_cache.get(item_id)
-        except Exception as e:
-            logger.error(f"Error fetching item data: {e}")
-        return None
+        return await self.bot.items.get(item_id)
+
+    async def reference_prices(self, item_ids: List[str]) -> dict:
+        prices = {}
+        history = self.bot.get_cog("PriceHistoryCog")
+        if history is not None and history.history_store is not None:
+            prices = await asyncio.to_thread(load_reference_prices, history.history_store, item_ids)
+        market = self.bot.get_cog("LiveMarketCog")
+        if market is not None:
+            watched = {item["id"]: item_key for item_key, item in market.watchlist.items()}
+            for item_id in item_ids:
+                series = market.price_series.get(watched.get(item_id))
+                if item_id not in prices and series is not None and series.ema:
+                    prices[item_id] = series.ema
+        return prices
 
     @tasks.loop(seconds=5)
     async def monitor_trading_post(self):
@@ -49,164 +121,251 @@ class TradingPostCog(commands.Cog):
         if not channel:
             logger.error("Trading channel not found!")
             return
+        start = time.perf_counter()
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.config.BASE_URL}/trades/chat"
-                params = {"limit": 100}
-                async with session.get(url, headers=self.config.HEADERS, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data["status"] == "OK" and data["body"]:
-                            await self.process_new_trades(data["body"], channel)
+            trades = await self.fetch_chat_trades()
+            if trades:
+                await self.process_new_trades(trades, channel)
         except Exception as e:
+            TICK_ERRORS.labels("trading_post", "monitor_trading_post").inc()
             logger.error(f"Error monitoring trading post: {e}")
+        TICK_SECONDS.labels("trading_post", "monitor_trading_post").observe(time.perf_counter() - start)
+
+    async def fetch_chat_trades(self) -> List[dict]:
+        params = {"limit": 100}
+        if self.use_from_param and self.feed_state.high_water:
+            params["from"] = self.feed_state.high_water
+        try:
+            data = await self.bot.api.get_json("/trades/chat", params=params)
+        except DarkerDBError as e:
+            if "from" not in params or e.status not in (400, 422):
+                raise
+            logger.warning("Trades chat endpoint rejected 'from'; polling without it")
+            self.use_from_param = False
+            params.pop("from")
+            data = await self.bot.api.get_json("/trades/chat", params=params)
+        if data["status"] == "OK":
+            return data["body"] or []
+        return []
+
+    def select_new_trades(self, trades: List[dict]) -> List[dict]:
+        high_water = self.feed_state.high_water
+        new_trades = []
+        for trade in trades:
+            timestamp = trade["timestamp"]
+            if high_water is not None and timestamp < high_water:
+                break
+            identity = trade_identity(trade)
+            if not self.feed_state.seen(identity):
+                new_trades.append((identity, trade))
+        new_trades.reverse()
+        for identity, trade in new_trades:
+            self.feed_state.remember(identity, trade["timestamp"])
+        return [trade for _, trade in new_trades]
 
     @tasks.loop(seconds=1)
     async def process_message_queue(self):
-        while self.message_update_queue:
-            message, embed = self.message_update_queue.popleft()
+        for future in self.message_update_queue.flush():
+            future.add_done_callback(self.log_edit_failure)
+        stats = self.message_update_queue.stats()
+        counts = (stats["coalesced"], stats["dropped"])
+        if counts != self.reported_edit_stats and any(counts):
+            self.reported_edit_stats = counts
+            logger.info(
+                f"Stat edits: {stats['flushed']} applied, {stats['coalesced']} coalesced, {stats['dropped']} dropped"
+            )
+
+    def log_deal_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Failed to send deal message: {future.exception()}")
+
+    def log_edit_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error updating message: {future.exception()}")
+
+    async def process_new_trades(self, trades: List[dict], channel: discord.TextChannel):
+        new_trades = self.select_new_trades(trades)
+        if not new_trades:
+            return
+        await asyncio.to_thread(self.feed_state.write, self.feed_state.snapshot())
+        try:
+            ratings = await self.deals.rate_trades(new_trades)
+        except Exception as e:
+            logger.error(f"Error rating trades: {e}")
+            ratings = [[] for _ in new_trades]
+        posts = []
+        for trade, trade_ratings in zip(new_trades, ratings):
+            deals = [rating for rating in trade_ratings if rating is not None and rating.deal]
+            embed = self.build_trade_embed(trade, deals)
+            posts.append((trade, embed, deals, self.build_listing(trade, embed, trade_ratings)))
+        listings = [(trade_identity(trade), listing) for trade, _, _, listing in posts if listing]
+        if listings:
             try:
-                await message.edit(embed=embed)
+                await asyncio.to_thread(self.listings.put_many, listings)
             except Exception as e:
-                logger.error(f"Error updating message: {e}")
+                logger.error(f"Error saving trade listings: {e}")
+        TRADES_SEEN.inc(len(posts))
+        for trade, embed, deals, listing in posts:
+            DEALS_FLAGGED.inc(len(deals))
+            await self.send_trade_message(trade, channel, embed, deals, listing)
 
-    async def process_new_trades(self, trades: List[dict], channel: discord.TextChannel):
-        for trade in reversed(trades):
-            trade_time = datetime.fromisoformat(trade["timestamp"].replace('Z', '+00:00'))
-            if self.last_trade_time is None or trade_time > self.last_trade_time:
-                self.last_trade_time = trade_time
-                await self.send_trade_message(trade, channel)
+    def describe_deal(self, rating: ListingRating) -> str:
+        parts = [f"rolls {rating.rating:.1f}/10"]
+        if rating.discount is not None:
+            parts.append(f"{rating.price:g}g vs ~{rating.reference:.0f}g ({rating.discount:.0%} off)")
+        return f"**{rating.item_id.split('_')[0]}**: " + ", ".join(parts)
 
-    async def send_trade_message(self, trade: dict, channel: discord.TextChannel):
+    def build_trade_embed(self, trade: dict, deals: List[ListingRating]) -> discord.Embed:
         embed = discord.Embed(
             description=trade['message'],
-            color=discord.Color.gold(),
+            color=discord.Color.green() if deals else discord.Color.gold(),
             timestamp=datetime.fromisoformat(trade["timestamp"].replace('Z', '+00:00'))
         )
         if trade.get("sender"):
             embed.set_author(name=trade['sender'])
+        if deals:
+            embed.add_field(name="🔥 Deal", value="\n".join(self.describe_deal(rating) for rating in deals), inline=False)
+        return embed
+
+    def build_listing(self, trade: dict, embed: discord.Embed, ratings: List[ListingRating]) -> Optional[dict]:
+        if not trade.get("items") or not trade.get("sender"):
+            return None
+        items_with_stats = [
+            item for item in trade["items"]
+            if any(k.startswith(('primary_', 'secondary_')) for k in item.keys())
+        ]
+        if not items_with_stats:
+            return None
+        display_names = re.findall(r'\[(.*?)\]', trade['message'])
+        return {
+            "seller": trade["sender"],
+            "embed": embed.to_dict(),
+            "items": items_with_stats,
+            "names": [
+                display_names[index] if index < len(display_names) else item['item_id'].split('_')[0]
+                for index, item in enumerate(items_with_stats)
+            ],
+            "ratings": [rating.to_dict() if rating is not None else None for rating in ratings]
+        }
+
+    async def listing_rating(self, listing: dict, index: int) -> ListingRating:
+        stored = listing["ratings"][index] if index < len(listing["ratings"]) else None
+        if stored is not None and stored["ranges"]:
+            return ListingRating.from_dict(stored)
+        # Unrated at ingest (metadata unavailable) or rated without ranges, so score it against fresh metadata
+        item = listing["items"][index]
+        ranges = roll_ranges(await self.get_item_data(item['item_id']))
+        return ListingRating(item['item_id'], score_rolls(item, ranges), ranges)
+
+    async def send_trade_message(self, trade: dict, channel: discord.TextChannel, embed: discord.Embed, deals: List[ListingRating], listing: Optional[dict]):
         extracted_items = re.findall(r'\[(.*?)\]', trade['message'])
         if extracted_items:
             item_header = " ".join([f"[{item}]" for item in extracted_items])
             content = f"{item_header}\n\n\n"
         else:
             content = "\n\n\n"
-        view = await self.create_trade_view(trade, embed)
-        try:
-            message = await channel.send(content=content, embed=embed, view=view)
-            self.active_messages.append(message)
-            logger.info(f"New trade from {trade.get('sender', 'unknown')}")
-        except discord.HTTPException as e:
-            logger.error(f"Failed to send trade message: {e}")
+        view = self.create_trade_view(trade_identity(trade), listing)
+        future = self.bot.outbound.send(channel, priority=FEED, content=content, embed=embed, view=view)
+        future.add_done_callback(lambda f: self.trade_message_sent(trade, f))
+        if deals and self.config.DEALS_CHANNEL_ID:
+            deals_channel = self.bot.get_channel(self.config.DEALS_CHANNEL_ID)
+            if deals_channel is None:
+                logger.error("Deals channel not found!")
+                return
+            deal_view = self.create_trade_view(trade_identity(trade), listing)
+            deal_future = self.bot.outbound.send(deals_channel, priority=FEED, content=content, embed=embed, view=deal_view)
+            deal_future.add_done_callback(self.log_deal_failure)
 
-    async def create_trade_view(self, trade: dict, embed: discord.Embed) -> Optional[View]:
-        if not trade.get("items") or not trade.get("sender"):
+    def trade_message_sent(self, trade: dict, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Failed to send trade message: {future.exception()}")
+            return
+        self.active_messages.append(future.result())
+        logger.info(f"New trade from {trade.get('sender', 'unknown')}")
+
+    def create_trade_view(self, key: str, listing: Optional[dict]) -> Optional[View]:
+        if listing is None:
             return None
         view = View(timeout=None)
-        display_names = re.findall(r'\[(.*?)\]', trade['message'])
-        items_with_stats = [
-            item for item in trade["items"] 
-            if any(k.startswith(('primary_', 'secondary_')) for k in item.keys())
-        ]
-        for index, item in enumerate(items_with_stats):
+        for index, display_name in enumerate(listing["names"]):
             row_index = index if index < 5 else 4
-            display_name = display_names[index] if index < len(display_names) else item['item_id'].split('_')[0]
-            view.add_item(ItemStatsButton(
-                item_data=item,
-                seller_name=trade['sender'],
-                original_embed=embed,
-                item_index=index,
-                display_name=display_name,
-                cog=self,
-                row=row_index
-            ))
+            view.add_item(ItemStatsButton(key, index, display_name, row=row_index))
         return view
 
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info(f'TradingPostCog ready as {self.bot.user}')
-        self.monitor_trading_post.start()
-        self.process_message_queue.start()
-
-class ItemStatsButton(Button):
-    def __init__(self, item_data: dict, seller_name: str, original_embed: discord.Embed, item_index: int, display_name: str, cog: TradingPostCog, row: int):
-        unique_id = f"item_{int(time.time())}_{item_index}"
-        super().__init__(label=display_name[:25], style=discord.ButtonStyle.grey, custom_id=unique_id, row=row)
-        self.item_data = item_data
-        self.seller_name = seller_name
-        self.original_embed = original_embed
-        self.display_name = display_name
-        self.cog = cog
+        if not self.monitor_trading_post.is_running():
+            self.monitor_trading_post.start()
+        if not self.process_message_queue.is_running():
+            self.process_message_queue.start()
+
+def format_primary_stats(item: dict) -> str:
+    stats = []
+    for key, value in item.items():
+        if key.startswith("primary_"):
+            stat_name = key.replace("primary_", "").replace("_", " ").title()
+            stats.append(f"• **{stat_name}:** `{value}`")
+    return "__Primary Attributes__\n" + "\n".join(stats) if stats else ""
+
+def format_secondary_stats(item: dict, ranges: dict) -> str:
+    stats = []
+    for key, value in item.items():
+        if key.startswith("secondary_"):
+            stat_name = key.replace("secondary_", "").replace("_", " ").title()
+            stat_line = f"• **{stat_name}:** `{value}`"
+            bounds = ranges.get(key[10:])
+            if bounds is not None and bounds[0] != bounds[1]:
+                stat_line += f" (`{bounds[0]:g}-{bounds[1]:g}`)"
+            stats.append(stat_line)
+    return "__Secondary Attributes__\n" + "\n".join(stats) if stats else ""
+
+def create_stats_embed(listing: dict, index: int, rating: ListingRating) -> discord.Embed:
+    item = listing["items"][index]
+    embed = discord.Embed.from_dict(listing["embed"])
+    primary_stats = format_primary_stats(item)
+    secondary_stats = format_secondary_stats(item, rating.ranges)
+    whisper_cmd = f"```/w {listing['seller']}```"
+    embed.clear_fields()
+    embed.add_field(name="\u200b", value="\u200b", inline=True)
+    embed.add_field(name="Item Rating", value=f"\n**{rating.rating:.1f}/10**\n", inline=True)
+    embed.add_field(name="\u200b", value="\u200b", inline=True)
+    embed.add_field(name=f"{listing['names'][index]} Stats", value=f"{primary_stats}\n{secondary_stats}\n\n{whisper_cmd}", inline=False)
+    return embed
+
+class ItemStatsButton(DynamicItem[Button], template=r'stats:(?P<key>[0-9a-f]{16}):(?P<index>[0-9]+)'):
+    def __init__(self, key: str, index: int, display_name: str = "Stats", row: Optional[int] = None):
+        super().__init__(Button(
+            label=display_name[:25],
+            style=discord.ButtonStyle.grey,
+            custom_id=f"stats:{key}:{index}",
+            row=row
+        ))
+        self.key = key
+        self.index = index
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["key"], int(match["index"]), item.label or "Stats")
 
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(thinking=True)
+        cog = interaction.client.get_cog("TradingPostCog")
         try:
-            item_info = await self.cog.get_item_data(self.item_data['item_id'])
-            embed = await self.create_stats_embed(item_info)
-            self.cog.message_update_queue.append((interaction.message, embed))
+            listing = await asyncio.to_thread(cog.listings.get, self.key) if cog is not None else None
+            if listing is None or self.index >= len(listing["items"]):
+                await interaction.followup.send("This listing is no longer available.", ephemeral=True)
+                return
+            rating = await cog.listing_rating(listing, self.index)
+            embed = create_stats_embed(listing, self.index, rating)
+            cog.message_update_queue.put(interaction.message, embed=embed)
         except Exception as e:
             logger.error(f"Error showing item stats: {e}")
             await interaction.followup.send("Failed to show item stats", ephemeral=True)
             return
         await interaction.followup.send("\u200b", ephemeral=True)
 
-    async def create_stats_embed(self, item_info: Optional[dict]) -> discord.Embed:
-        embed = discord.Embed.from_dict(self.original_embed.to_dict())
-        primary_stats = self.format_primary_stats()
-        secondary_stats = await self.format_secondary_stats(item_info)
-        rating = self.calculate_secondary_ranking(item_info)
-        whisper_cmd = f"```/w {self.seller_name}```"
-        embed.clear_fields()
-        embed.add_field(name="\u200b", value="\u200b", inline=True)
-        embed.add_field(name="Item Rating", value=f"\n**{rating:.1f}/10**\n", inline=True)
-        embed.add_field(name="\u200b", value="\u200b", inline=True)
-        embed.add_field(name=f"{self.display_name} Stats", value=f"{primary_stats}\n{secondary_stats}\n\n{whisper_cmd}", inline=False)
-        return embed
-
-    def calculate_secondary_ranking(self, item_info: Optional[dict]) -> float:
-        scores = []
-        for key, value in self.item_data.items():
-            if key.startswith("secondary_"):
-                stat_key = key[10:]
-                if item_info:
-                    min_val = item_info.get(f"secondary_min_{stat_key}")
-                    max_val = item_info.get(f"secondary_max_{stat_key}")
-                    if min_val is not None and max_val is not None:
-                        try:
-                            fmin = float(min_val)
-                            fmax = float(max_val)
-                            fcurrent = float(value)
-                            if fmax > fmin:
-                                normalized = (fcurrent - fmin) / (fmax - fmin) * 10
-                                scores.append(normalized)
-                        except Exception as e:
-                            logger.error(f"Error calculating ranking for {key}: {e}")
-        return sum(scores) / len(scores) if scores else 0.0
-
-    def format_primary_stats(self) -> str:
-        stats = []
-        for key, value in self.item_data.items():
-            if key.startswith("primary_"):
-                stat_name = key.replace("primary_", "").replace("_", " ").title()
-                stats.append(f"• **{stat_name}:** `{value}`")
-        return "__Primary Attributes__\n" + "\n".join(stats) if stats else ""
-
-    async def format_secondary_stats(self, item_info: Optional[dict]) -> str:
-        stats = []
-        for key, value in self.item_data.items():
-            if key.startswith("secondary_"):
-                stat_name = key.replace("secondary_", "").replace("_", " ").title()
-                min_val = item_info.get(f"secondary_min_{key[10:]}") if item_info else None
-                max_val = item_info.get(f"secondary_max_{key[10:]}") if item_info else None
-                stat_line = f"• **{stat_name}:** `{value}`"
-                if min_val is not None and max_val is not None:
-                    try:
-                        if float(min_val) != float(max_val):
-                            stat_line += f" (`{min_val}-{max_val}`)"
-                    except:
-                        pass
-                stats.append(stat_line)
-        return "__Secondary Attributes__\n" + "\n".join(stats) if stats else ""
-
 async def setup(bot: commands.Bot):
     await bot.add_cog(TradingPostCog(bot))
@@ -0,0 +1,174 @@
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+CONDITIONS = {
+    "below": ("price", "below"),
+    "above": ("price", "above"),
+    "rise_1h": ("change_1h", "above"),
+    "drop_1h": ("change_1h", "below"),
+    "rise_24h": ("change_24h", "above"),
+    "drop_24h": ("change_24h", "below"),
+}
+
+class Alert:
+    def __init__(self, alert_id, user_id, item_key, condition, value, created_at=None, last_triggered=0.0):
+        self.id = alert_id
+        self.user_id = user_id
+        self.item_key = item_key
+        self.condition = condition
+        self.value = value
+        self.created_at = created_at or time.time()
+        self.last_triggered = last_triggered
+
+    @property
+    def metric(self):
+        return CONDITIONS[self.condition][0]
+
+    @property
+    def direction(self):
+        return CONDITIONS[self.condition][1]
+
+    @property
+    def threshold(self):
+        # Drops are stored as negative changes so both directions share one sorted index
+        return -self.value if self.condition.startswith("drop") else self.value
+
+    def holds(self, value):
+        if value is None:
+            return False
+        return value <= self.threshold if self.direction == "below" else value >= self.threshold
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "item_key": self.item_key,
+            "condition": self.condition,
+            "value": self.value,
+            "created_at": self.created_at,
+            "last_triggered": self.last_triggered
+        }
+
+class ThresholdIndex:
+    def __init__(self):
+        self.thresholds = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, threshold, alert_id):
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, alert_id)
+
+    def remove(self, threshold, alert_id):
+        i = bisect_left(self.thresholds, threshold)
+        while i < len(self.ids) and self.thresholds[i] == threshold:
+            if self.ids[i] == alert_id:
+                del self.thresholds[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def between(self, low, high, low_inclusive, high_inclusive):
+        start = (bisect_left if low_inclusive else bisect_right)(self.thresholds, low)
+        end = (bisect_right if high_inclusive else bisect_left)(self.thresholds, high)
+        return self.ids[start:end]
+
+class AlertEngine:
+    def __init__(self, cooldown=3600, max_per_user=25):
+        self.cooldown = cooldown
+        self.max_per_user = max_per_user
+        self.alerts = {}
+        self.by_user = defaultdict(set)
+        self.indexes = defaultdict(ThresholdIndex)
+        self.last_values = {}
+        self.next_id = 1
+        self.triggered = 0
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def add(self, user_id, item_key, condition, value):
+        if condition not in CONDITIONS:
+            raise ValueError(f"Unknown condition {condition}")
+        if len(self.by_user[user_id]) >= self.max_per_user:
+            raise ValueError(f"You already have {self.max_per_user} alerts")
+        alert = Alert(self.next_id, user_id, item_key, condition, value)
+        self.next_id += 1
+        self.insert(alert)
+        return alert
+
+    def insert(self, alert):
+        self.alerts[alert.id] = alert
+        self.by_user[alert.user_id].add(alert.id)
+        self.indexes[(alert.item_key, alert.metric, alert.direction)].add(alert.threshold, alert.id)
+        self.next_id = max(self.next_id, alert.id + 1)
+
+    def remove(self, alert_id, user_id=None):
+        alert = self.alerts.get(alert_id)
+        if alert is None or (user_id is not None and alert.user_id != user_id):
+            return None
+        del self.alerts[alert_id]
+        self.by_user[alert.user_id].discard(alert_id)
+        self.indexes[(alert.item_key, alert.metric, alert.direction)].remove(alert.threshold, alert_id)
+        return alert
+
+    def for_user(self, user_id):
+        return sorted((self.alerts[alert_id] for alert_id in self.by_user.get(user_id, ())), key=lambda a: a.id)
+
+    def current(self, item_key, metric):
+        return self.last_values.get((item_key, metric))
+
+    def crossed(self, item_key, metric, previous, value):
+        below = self.indexes.get((item_key, metric, "below"))
+        above = self.indexes.get((item_key, metric, "above"))
+        ids = []
+        if below:
+            if previous is None:
+                ids += below.between(value, float("inf"), True, True)
+            elif value < previous:
+                ids += below.between(value, previous, True, False)
+        if above:
+            if previous is None:
+                ids += above.between(float("-inf"), value, True, True)
+            elif value > previous:
+                ids += above.between(previous, value, False, True)
+        return ids
+
+    def observe(self, item_key, metrics, now=None):
+        now = now or time.time()
+        fired = []
+        for metric, value in metrics.items():
+            if value is None:
+                continue
+            previous = self.last_values.get((item_key, metric))
+            self.last_values[(item_key, metric)] = value
+            for alert_id in self.crossed(item_key, metric, previous, value):
+                alert = self.alerts[alert_id]
+                if now - alert.last_triggered < self.cooldown:
+                    continue
+                alert.last_triggered = now
+                fired.append((alert, value))
+        self.triggered += len(fired)
+        return fired
+
+    def snapshot(self):
+        return {
+            "next_id": self.next_id,
+            "alerts": [alert.to_dict() for alert in self.alerts.values()],
+            "last_values": [[item_key, metric, value] for (item_key, metric), value in self.last_values.items()]
+        }
+
+    def restore(self, state):
+        for data in state.get("alerts", []):
+            if data.get("condition") in CONDITIONS:
+                self.insert(Alert(
+                    data["id"], data["user_id"], data["item_key"], data["condition"], data["value"],
+                    data.get("created_at"), data.get("last_triggered", 0.0)
+                ))
+        for item_key, metric, value in state.get("last_values", []):
+            self.last_values[(item_key, metric)] = value
+        self.next_id = max(self.next_id, state.get("next_id", 1))
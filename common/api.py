@@ -0,0 +1,99 @@
+import re
+import time
+import aiohttp
+import logging
+from urllib.parse import urlparse
+from common.config import Config
+from common.metrics import REGISTRY
+
+logger = logging.getLogger('DarkAndDarkerDB.API')
+
+REQUEST_SECONDS = REGISTRY.histogram("darkerdb_request_seconds", "DarkerDB request latency", ["endpoint"])
+REQUEST_ERRORS = REGISTRY.counter("darkerdb_request_errors_total", "Failed DarkerDB requests", ["endpoint", "reason"])
+
+# Per-item paths collapse to one label so metric cardinality stays bounded
+ENDPOINT_TEMPLATES = (
+    (re.compile(r"^/market/analytics/[^/]+"), "/market/analytics/{item_id}"),
+)
+
+class DarkerDBError(Exception):
+    def __init__(self, status, url):
+        super().__init__(f"API returned status code {status} for {url}")
+        self.status = status
+        self.url = url
+
+class DarkerDBClient:
+    def __init__(self, base_url=None, limit=None, limit_per_host=None, timeout=None, dns_ttl=300, keepalive_timeout=60):
+        self.config = Config()
+        self.base_url = (base_url or self.config.BASE_URL).rstrip("/")
+        self.limit = limit or self.config.API_CONNECTION_LIMIT
+        self.limit_per_host = limit_per_host or self.config.API_CONNECTIONS_PER_HOST
+        self.timeout = aiohttp.ClientTimeout(total=timeout or self.config.API_TIMEOUT)
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.base_path = urlparse(self.base_url).path
+
+    async def start(self):
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers=self.config.HEADERS
+        )
+        logger.info(f"DarkerDB client started (limit={self.limit}, per_host={self.limit_per_host})")
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def url(self, path):
+        if path.startswith("http"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def endpoint(self, path):
+        endpoint = urlparse(path).path if path.startswith("http") else path.split("?")[0]
+        if endpoint.startswith(self.base_path):
+            endpoint = endpoint[len(self.base_path):]
+        endpoint = "/" + endpoint.strip("/")
+        for pattern, template in ENDPOINT_TEMPLATES:
+            endpoint = pattern.sub(template, endpoint)
+        return endpoint
+
+    async def get_json(self, path, params=None, timeout=None, endpoint=None):
+        if self.session is None or self.session.closed:
+            await self.start()
+        url = self.url(path)
+        endpoint = endpoint or self.endpoint(path)
+        kwargs = {"params": params}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        start = time.perf_counter()
+        try:
+            async with self.session.get(url, **kwargs) as response:
+                if response.status != 200:
+                    REQUEST_ERRORS.labels(endpoint, str(response.status)).inc()
+                    raise DarkerDBError(response.status, url)
+                return await response.json()
+        except DarkerDBError:
+            raise
+        except BaseException as e:
+            REQUEST_ERRORS.labels(endpoint, type(e).__name__).inc()
+            raise
+        finally:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+    async def get_body(self, path, params=None, timeout=None, endpoint=None):
+        data = await self.get_json(path, params=params, timeout=timeout, endpoint=endpoint)
+        if data.get("status") != "OK":
+            raise Exception(f"API Error: {data.get('status')}")
+        return data.get("body")
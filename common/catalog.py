@@ -0,0 +1,81 @@
+import os
+import asyncio
+import logging
+from common.utils import read_json, write_json
+
+logger = logging.getLogger('DarkAndDarkerDB.Catalog')
+
+CATALOG_FIELDS = ("id", "name", "archetype", "rarity", "num_secondary_attributes")
+CATALOG_PREFIXES = ("primary_min_", "primary_max_", "secondary_min_", "secondary_max_")
+
+def compact_item(item):
+    return {
+        key: value for key, value in item.items()
+        if key in CATALOG_FIELDS or key.startswith(CATALOG_PREFIXES)
+    }
+
+def load_catalog(path):
+    return read_json(path, default=[])
+
+class CatalogCrawler:
+    def __init__(self, api, checkpoint_path, page_size=100, concurrency=8, retries=4, backoff=1.0):
+        self.api = api
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.num_pages = None
+        self.pages = {}
+        self.checkpoint_lock = asyncio.Lock()
+
+    def load_checkpoint(self):
+        checkpoint = read_json(self.checkpoint_path)
+        if not checkpoint or checkpoint.get("page_size") != self.page_size:
+            return
+        self.num_pages = checkpoint.get("num_pages")
+        self.pages = {int(page): items for page, items in checkpoint.get("pages", {}).items()}
+        logger.info(f"Resuming catalog crawl with {len(self.pages)}/{self.num_pages} pages done")
+
+    async def save_checkpoint(self):
+        async with self.checkpoint_lock:
+            checkpoint = {"page_size": self.page_size, "num_pages": self.num_pages, "pages": dict(self.pages)}
+            await asyncio.to_thread(write_json, self.checkpoint_path, checkpoint, separators=(",", ":"))
+
+    async def fetch_page(self, page):
+        for attempt in range(self.retries + 1):
+            try:
+                data = await self.api.get_json("/items", params={"page": page, "limit": self.page_size})
+                if data.get("status") != "OK":
+                    raise Exception(f"API Error: {data.get('status')}")
+                return data
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Page {page} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def crawl_page(self, page, semaphore):
+        async with semaphore:
+            data = await self.fetch_page(page)
+        self.pages[page] = [compact_item(item) for item in data.get("body") or [] if item.get("id")]
+        logger.info(f"Fetched catalog page {page}/{self.num_pages} ({len(self.pages[page])} items)")
+        await self.save_checkpoint()
+        return data
+
+    async def crawl(self):
+        self.load_checkpoint()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        if self.num_pages is None or 1 not in self.pages:
+            data = await self.crawl_page(1, semaphore)
+            self.num_pages = data.get("pagination", {}).get("num_pages", 1)
+            await self.save_checkpoint()
+        remaining = [page for page in range(2, self.num_pages + 1) if page not in self.pages]
+        await asyncio.gather(*(self.crawl_page(page, semaphore) for page in remaining))
+        catalog = {item["id"]: item for page in sorted(self.pages) for item in self.pages[page]}
+        return list(catalog.values())
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
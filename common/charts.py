@@ -0,0 +1,132 @@
+import io
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+from matplotlib.collections import PolyCollection
+
+logger = logging.getLogger('DarkAndDarkerDB.Charts')
+
+CANDLE_FIELDS = ("avg", "min", "max", "volume")
+
+def to_candle_arrays(market_data):
+    timestamps = np.array([d["timestamp"] for d in market_data], dtype="U20").astype("U19").astype("datetime64[s]")
+    candles = {"timestamp": timestamps}
+    for field in CANDLE_FIELDS:
+        candles[field] = np.fromiter((d[field] for d in market_data), dtype=np.float64, count=len(market_data))
+    return candles
+
+def compute_thresholds(values, multiplier=1.5, lower_percentile=25, upper_percentile=75):
+    q1, q3 = np.percentile(values, [lower_percentile, upper_percentile])
+    iqr = q3 - q1
+    return q1 - (multiplier * iqr), q3 + (multiplier * iqr)
+
+def filter_outliers_iqr(candles, multiplier=0.7):
+    if len(candles["timestamp"]) == 0:
+        return candles
+    _, max_bound_max = compute_thresholds(candles["max"], multiplier, lower_percentile=35, upper_percentile=75)
+    min_bound_min, _ = compute_thresholds(candles["min"], multiplier, lower_percentile=35, upper_percentile=75)
+    mask = (
+        (candles["max"] <= max_bound_max)
+        & (candles["min"] >= min_bound_min)
+        & (candles["avg"] != 0)
+        & (candles["max"] <= 3 * candles["avg"])
+    )
+    return {key: values[mask] for key, values in candles.items()}
+
+def render_candle_chart(candles, item_name=None):
+    start = time.perf_counter()
+    plt.style.use('dark_background')
+    fig, ax = plt.subplots(figsize=(30, 16), dpi=100)
+    bar_width = 0.5
+    close = candles["avg"]
+    count = len(close)
+    x = np.arange(count)
+    if count:
+        open_ = np.concatenate((close[:1], close[:-1]))
+        colors = np.where(close >= open_, 'green', 'red')
+        bottom = np.minimum(open_, close)
+        top = np.maximum(open_, close)
+        left = x - bar_width / 2
+        right = x + bar_width / 2
+        bodies = np.stack((
+            np.column_stack((left, bottom)), np.column_stack((left, top)),
+            np.column_stack((right, top)), np.column_stack((right, bottom))
+        ), axis=1)
+        ax.vlines(x, candles["min"], candles["max"], colors=colors, linewidth=1)
+        ax.add_collection(PolyCollection(bodies, facecolors=colors, edgecolors='none'))
+        ax.set_xlim(-1, count)
+
+    ax.set_axisbelow(True)
+    ax.yaxis.grid(True, linestyle=':', color='grey')
+
+    days = candles["timestamp"].astype("datetime64[D]")
+    day_ticks = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1]))) if count else np.array([], dtype=int)
+    day_labels = [days[i].astype(datetime).strftime('%m/%d %a') for i in day_ticks]
+    if len(day_ticks):
+        ax.vlines(day_ticks, 0, 1, transform=ax.get_xaxis_transform(), colors='grey', linestyles='--', alpha=0.3)
+
+    ax.set_xticks(day_ticks)
+    ax.set_xticklabels(day_labels, rotation=45, fontsize=16)
+    ax.set_xlabel("Date", fontsize=20)
+    ax.set_ylabel("Price", fontsize=20)
+
+    if item_name:
+        ax.set_title(f"{item_name} 2 Week Candle Chart", fontsize=24)
+    else:
+        ax.set_title("2 Week Candle Chart", fontsize=24)
+
+    legend_elements = [
+        Patch(facecolor='green', label='Price Increase (Close ≥ Open)'),
+        Patch(facecolor='red', label='Price Decrease (Close < Open)')
+    ]
+    ax.legend(handles=legend_elements, fontsize=16)
+
+    if count:
+        global_min = candles["min"].min()
+        global_max = candles["max"].max()
+        buffer = (global_max - global_min) * 0.1
+        ax.set_ylim(global_min - buffer, global_max + buffer)
+
+    ax.text(0.01, 0.99, "Powered by darkerdb.com", transform=ax.transAxes,
+            fontsize=10, color='grey', verticalalignment='top')
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue(), time.perf_counter() - start
+
+class ChartRenderer:
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.slots = asyncio.Semaphore(max_workers)
+        self.waiting = 0
+
+    async def render(self, candles, item_name=None):
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        acquired = False
+        try:
+            async with self.slots:
+                self.waiting -= 1
+                acquired = True
+                wait_time = time.perf_counter() - queued_at
+                loop = asyncio.get_running_loop()
+                png, render_time = await loop.run_in_executor(self.executor, render_candle_chart, candles, item_name)
+        finally:
+            if not acquired:
+                self.waiting -= 1
+        logger.info(f"Rendered chart for {item_name} in {render_time:.2f}s (queued {wait_time:.2f}s, {len(png)} bytes)")
+        return png
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -12,6 +12,41 @@ class Config:
     TRADING_CHANNEL_ID = int(os.getenv('TRADING_CHANNEL_ID', 0))
     
     BASE_URL = "https://api.darkerdb.com/v1"
+    API_CONNECTION_LIMIT = int(os.getenv('API_CONNECTION_LIMIT', 100))
+    API_CONNECTIONS_PER_HOST = int(os.getenv('API_CONNECTIONS_PER_HOST', 20))
+    API_TIMEOUT = float(os.getenv('API_TIMEOUT', 15))
+    MARKET_CONCURRENCY = int(os.getenv('MARKET_CONCURRENCY', 10))
+    MARKET_REQUEST_TIMEOUT = float(os.getenv('MARKET_REQUEST_TIMEOUT', 10))
+    MARKET_MIN_POLL = int(os.getenv('MARKET_MIN_POLL', 60))
+    MARKET_MAX_POLL = int(os.getenv('MARKET_MAX_POLL', 600))
+    WATCHLIST_PATH = os.getenv('WATCHLIST_PATH', 'watchlist.json')
+    ALERT_COOLDOWN = int(os.getenv('ALERT_COOLDOWN', 3600))
+    ALERT_MAX_PER_USER = int(os.getenv('ALERT_MAX_PER_USER', 25))
+    DEALS_CHANNEL_ID = int(os.getenv('DEALS_CHANNEL_ID') or 0)
+    DEAL_ROLL_THRESHOLD = float(os.getenv('DEAL_ROLL_THRESHOLD', 8.5))
+    DEAL_DISCOUNT = float(os.getenv('DEAL_DISCOUNT', 0.3))
+    LISTING_STORE_ROWS = int(os.getenv('LISTING_STORE_ROWS', 20000))
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+    LOOP_WATCHDOG = os.getenv('LOOP_WATCHDOG', 'true').lower() in ('1', 'true', 'yes')
+    LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', 0.5))
+    LOOP_SLOW_CALLBACK = float(os.getenv('LOOP_SLOW_CALLBACK', 0.1))
+    LOOP_DEBUG = os.getenv('LOOP_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+
+    OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', 4))
+
+    DATA_DIR = os.getenv('DATA_DIR', 'data')
+    CATALOG_PATH = os.getenv('CATALOG_PATH', os.path.join(DATA_DIR, 'item_catalog.json'))
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', 30))
+    HISTORY_MAX_SERIES = int(os.getenv('HISTORY_MAX_SERIES', 500))
+    ITEM_CACHE_ENTRIES = int(os.getenv('ITEM_CACHE_ENTRIES', 5000))
+    ITEM_CACHE_TTL = int(os.getenv('ITEM_CACHE_TTL', 6 * 3600))
+    TRADE_CACHE_TTL = int(os.getenv('TRADE_CACHE_TTL', 300))
+    TRADE_CACHE_SELLERS = int(os.getenv('TRADE_CACHE_SELLERS', 200))
+    TRADE_CACHE_ROWS = int(os.getenv('TRADE_CACHE_ROWS', 50000))
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', 2))
+    CHART_CACHE_ENTRIES = int(os.getenv('CHART_CACHE_ENTRIES', 64))
+    CHART_CACHE_BYTES = int(os.getenv('CHART_CACHE_BYTES', 64 * 1024 * 1024))
     
     @property
     def HEADERS(self):
@@ -0,0 +1,148 @@
+import re
+import asyncio
+import logging
+import statistics
+from datetime import datetime, timedelta, timezone
+from common.cache import LRUCache
+from common.history import format_timestamp
+
+logger = logging.getLogger('DarkAndDarkerDB.Deals')
+
+PRICE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(k)?\s*(?:g|gold)\b', re.IGNORECASE)
+
+def parse_price(message):
+    prices = PRICE_PATTERN.findall(message or "")
+    if len(prices) != 1:
+        return None
+    amount, thousands = prices[0]
+    return float(amount) * (1000 if thousands else 1)
+
+def roll_ranges(item_info):
+    ranges = {}
+    for key, min_val in (item_info or {}).items():
+        if not key.startswith("secondary_min_"):
+            continue
+        stat_key = key[14:]
+        max_val = item_info.get(f"secondary_max_{stat_key}")
+        try:
+            ranges[stat_key] = (float(min_val), float(max_val))
+        except (TypeError, ValueError):
+            continue
+    return ranges
+
+def score_rolls(item, ranges):
+    scores = []
+    for key, value in item.items():
+        if not key.startswith("secondary_"):
+            continue
+        bounds = ranges.get(key[10:])
+        if bounds is None or bounds[1] <= bounds[0]:
+            continue
+        try:
+            scores.append((float(value) - bounds[0]) / (bounds[1] - bounds[0]) * 10)
+        except (TypeError, ValueError):
+            continue
+    return sum(scores) / len(scores) if scores else 0.0
+
+def load_reference_prices(store, item_ids, window=timedelta(hours=24), interval="30m"):
+    since = format_timestamp(datetime.now(timezone.utc) - window)
+    prices = {}
+    for item_id in item_ids:
+        averages = [b.get("avg") for b in store.load((item_id, "", interval), since)]
+        averages = [avg for avg in averages if avg]
+        if averages:
+            prices[item_id] = statistics.median(averages)
+    return prices
+
+class ListingRating:
+    def __init__(self, item_id, rating, ranges, price=None, reference=None, deal=False):
+        self.item_id = item_id
+        self.rating = rating
+        self.ranges = ranges
+        self.price = price
+        self.reference = reference
+        self.deal = deal
+
+    @property
+    def discount(self):
+        if not self.price or not self.reference:
+            return None
+        return 1 - self.price / self.reference
+
+    def to_dict(self):
+        return {
+            "item_id": self.item_id,
+            "rating": self.rating,
+            "ranges": {stat: list(bounds) for stat, bounds in self.ranges.items()},
+            "price": self.price,
+            "reference": self.reference,
+            "deal": self.deal
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        ranges = {stat: tuple(bounds) for stat, bounds in data.get("ranges", {}).items()}
+        return cls(data["item_id"], data["rating"], ranges, data.get("price"), data.get("reference"), data.get("deal", False))
+
+class DealScanner:
+    def __init__(self, items, reference_lookup=None, roll_threshold=8.5, discount_threshold=0.3, max_ranges=2000):
+        self.items = items
+        self.reference_lookup = reference_lookup
+        self.roll_threshold = roll_threshold
+        self.discount_threshold = discount_threshold
+        self.ranges = LRUCache(max_entries=max_ranges)
+        self.rated = 0
+        self.deals = 0
+
+    async def ranges_for(self, item_ids):
+        missing = [item_id for item_id in item_ids if item_id not in self.ranges]
+        infos = await asyncio.gather(*(self.items.get(item_id) for item_id in missing), return_exceptions=True)
+        for item_id, info in zip(missing, infos):
+            if isinstance(info, BaseException):
+                logger.error(f"Error loading roll ranges for {item_id}: {info}")
+                continue
+            if info:
+                self.ranges.set(item_id, roll_ranges(info))
+        # Ids whose metadata didn't load are left out so they aren't rated against empty ranges
+        return {item_id: self.ranges.entries[item_id] for item_id in item_ids if item_id in self.ranges}
+
+    async def rate_trades(self, trades):
+        stat_items = [
+            [item for item in trade.get("items") or [] if any(k.startswith(("primary_", "secondary_")) for k in item)]
+            for trade in trades
+        ]
+        item_ids = list({item["item_id"] for items in stat_items for item in items})
+        if not item_ids:
+            return [[] for _ in trades]
+        ranges = await self.ranges_for(item_ids)
+        references = {}
+        if self.reference_lookup is not None:
+            try:
+                references = await self.reference_lookup(item_ids)
+            except Exception as e:
+                logger.error(f"Error loading reference prices: {e}")
+        ratings = []
+        for trade, items in zip(trades, stat_items):
+            message_price = parse_price(trade.get("message")) if len(items) == 1 else None
+            trade_ratings = []
+            for item in items:
+                item_id = item["item_id"]
+                if item_id not in ranges:
+                    trade_ratings.append(None)
+                    continue
+                rating = ListingRating(
+                    item_id,
+                    score_rolls(item, ranges[item_id]),
+                    ranges[item_id],
+                    item.get("price") or message_price,
+                    references.get(item_id)
+                )
+                discount = rating.discount
+                rating.deal = rating.rating >= self.roll_threshold or (
+                    discount is not None and discount >= self.discount_threshold
+                )
+                trade_ratings.append(rating)
+            ratings.append(trade_ratings)
+        self.rated += sum(rating is not None for r in ratings for rating in r)
+        self.deals += sum(rating is not None and rating.deal for r in ratings for rating in r)
+        return ratings
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+HISTORY_WINDOW = timedelta(days=4)
+
+def format_timestamp(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def split_windows(start, end, window=HISTORY_WINDOW):
+    windows = []
+    cursor = start
+    while cursor < end:
+        window_end = min(cursor + window, end)
+        if end - window_end < timedelta(minutes=1):
+            window_end = end
+        windows.append((cursor, window_end))
+        cursor = window_end
+    return windows
+
+def history_params(interval, secondary=None, start=None, end=None):
+    params = {"interval": interval}
+    if start is not None:
+        params["from"] = format_timestamp(start)
+    if end is not None:
+        params["to"] = format_timestamp(end)
+    if secondary is not None:
+        field, value = secondary
+        params[f"secondary[{field}]"] = value
+    return params
+
+def merge_buckets(*chunks):
+    merged = {}
+    for chunk in chunks:
+        for bucket in chunk:
+            merged[bucket["timestamp"]] = bucket
+    return [merged[ts] for ts in sorted(merged)]
+
+async def fetch_price_history(api, item_id, start, end=None, interval="30m", secondary=None, window=HISTORY_WINDOW):
+    now = datetime.now(timezone.utc)
+    end = end or now
+    path = f"/market/analytics/{item_id}/prices/history"
+    windows = split_windows(start, end, window)
+
+    async def fetch_window(window_start, window_end):
+        # Leave the newest window open-ended so the bucket currently filling is included
+        params = history_params(interval, secondary, window_start, None if window_end >= now else window_end)
+        data = await api.get_json(path, params=params, endpoint="/market/analytics/{item_id}/prices/history")
+        return data.get("body") or []
+
+    chunks = await asyncio.gather(*(fetch_window(s, e) for s, e in windows))
+    return merge_buckets(*chunks)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from common.history import fetch_price_history, format_timestamp
+
+logger = logging.getLogger('DarkAndDarkerDB.HistoryStore')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    item_id TEXT NOT NULL,
+    filter_key TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    covered_from TEXT NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (item_id, filter_key, interval)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    item_id TEXT NOT NULL,
+    filter_key TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (item_id, filter_key, interval, timestamp)
+) WITHOUT ROWID;
+"""
+
+def filter_key(secondary):
+    if secondary is None:
+        return ""
+    field, value = secondary
+    return f"{field}={value}"
+
+def parse_timestamp(ts):
+    return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+class PriceHistoryStore:
+    def __init__(self, path, retention_days=30, max_series=500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.retention = timedelta(days=retention_days)
+        self.max_series = max_series
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def coverage(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT covered_from FROM series WHERE item_id=? AND filter_key=? AND interval=?", key
+            ).fetchone()
+            if row is None:
+                return None, None
+            latest = self.conn.execute(
+                "SELECT MAX(timestamp) FROM buckets WHERE item_id=? AND filter_key=? AND interval=?", key
+            ).fetchone()[0]
+            return row[0], latest
+
+    def save(self, key, buckets, covered_from=None):
+        now = time.time()
+        rows = [(*key, b["timestamp"], json.dumps(b, separators=(",", ":"))) for b in buckets]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?)", rows)
+            if covered_from is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)", (*key, covered_from, now)
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE series SET last_access=? WHERE item_id=? AND filter_key=? AND interval=?", (now, *key)
+                )
+        self.prune(key)
+
+    def load(self, key, since):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM buckets WHERE item_id=? AND filter_key=? AND interval=? AND timestamp>=? "
+                "ORDER BY timestamp", (*key, since)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def prune(self, key):
+        cutoff = format_timestamp(datetime.now(timezone.utc) - self.retention)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM buckets WHERE item_id=? AND filter_key=? AND interval=? AND timestamp<?", (*key, cutoff)
+            )
+            self.conn.execute(
+                "UPDATE series SET covered_from=? WHERE item_id=? AND filter_key=? AND interval=? AND covered_from<?",
+                (cutoff, *key, cutoff)
+            )
+            evicted = self.conn.execute(
+                "SELECT item_id, filter_key, interval FROM series ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_series,)
+            ).fetchall()
+            for old in evicted:
+                self.conn.execute("DELETE FROM buckets WHERE item_id=? AND filter_key=? AND interval=?", old)
+                self.conn.execute("DELETE FROM series WHERE item_id=? AND filter_key=? AND interval=?", old)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} price history series from {self.path}")
+
+async def sync_price_history(api, store, item_id, start, interval="30m", secondary=None):
+    key = (item_id, filter_key(secondary), interval)
+    since = format_timestamp(start)
+    covered_from, latest = await asyncio.to_thread(store.coverage, key)
+    if covered_from is not None and latest is not None and covered_from <= since:
+        # Refetch from the newest stored bucket so a partially filled bucket gets updated
+        tail = await fetch_price_history(api, item_id, parse_timestamp(latest), interval=interval, secondary=secondary)
+        await asyncio.to_thread(store.save, key, tail)
+        logger.debug(f"History tail sync for {key}: {len(tail)} buckets")
+    else:
+        buckets = await fetch_price_history(api, item_id, start, interval=interval, secondary=secondary)
+        await asyncio.to_thread(store.save, key, buckets, since)
+        logger.debug(f"History full sync for {key}: {len(buckets)} buckets")
+    return await asyncio.to_thread(store.load, key, since)
@@ -0,0 +1,184 @@
+import math
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+SHORT_WINDOW = 3600
+LONG_WINDOW = 24 * 3600
+EMA_PERIOD = 3600
+
+class PriceSeries:
+    def __init__(self, capacity, long_window=LONG_WINDOW, short_window=SHORT_WINDOW, ema_period=EMA_PERIOD):
+        self.capacity = capacity
+        self.long_window = long_window
+        self.short_window = short_window
+        self.ema_period = ema_period
+        self.times = array('d', [0.0]) * capacity
+        self.prices = array('d', [0.0]) * capacity
+        self.returns = array('d', [0.0]) * capacity
+        # Absolute sample numbers; slot = sample % capacity
+        self.count = 0
+        self.long_start = 0
+        self.short_start = 0
+        self.mins = deque()
+        self.maxes = deque()
+        self.return_sum = 0.0
+        self.return_squares = 0.0
+        self.ema = None
+        self.direction = 0
+
+    def __len__(self):
+        return self.count - self.long_start
+
+    def time_at(self, sample):
+        return self.times[sample % self.capacity]
+
+    def price_at(self, sample):
+        return self.prices[sample % self.capacity]
+
+    def drop_long(self):
+        self.long_start += 1
+        if self.long_start < self.count:
+            r = self.returns[self.long_start % self.capacity]
+            self.return_sum -= r
+            self.return_squares -= r * r
+        while self.mins and self.mins[0] < self.long_start:
+            self.mins.popleft()
+        while self.maxes and self.maxes[0] < self.long_start:
+            self.maxes.popleft()
+
+    def push(self, timestamp, price):
+        price = float(price)
+        if self.count > self.long_start:
+            last_time = self.time_at(self.count - 1)
+            last_price = self.price_at(self.count - 1)
+            if timestamp < last_time:
+                return
+            if price > last_price:
+                self.direction = 1
+            elif price < last_price:
+                self.direction = -1
+            else:
+                self.direction = 0
+            alpha = 1 - math.exp(-(timestamp - last_time) / self.ema_period)
+            self.ema += alpha * (price - self.ema)
+        else:
+            self.ema = price
+        if self.count - self.long_start == self.capacity:
+            self.drop_long()
+        slot = self.count % self.capacity
+        r = 0.0
+        if self.count > self.long_start and self.price_at(self.count - 1) > 0 and price > 0:
+            r = math.log(price / self.price_at(self.count - 1))
+            self.return_sum += r
+            self.return_squares += r * r
+        self.times[slot] = timestamp
+        self.prices[slot] = price
+        self.returns[slot] = r
+        while self.mins and self.price_at(self.mins[-1]) >= price:
+            self.mins.pop()
+        self.mins.append(self.count)
+        while self.maxes and self.price_at(self.maxes[-1]) <= price:
+            self.maxes.pop()
+        self.maxes.append(self.count)
+        self.count += 1
+        while self.long_start < self.count - 1 and self.time_at(self.long_start) < timestamp - self.long_window:
+            self.drop_long()
+        self.short_start = max(self.short_start, self.long_start)
+        while self.short_start < self.count - 1 and self.time_at(self.short_start) < timestamp - self.short_window:
+            self.short_start += 1
+
+    @property
+    def last(self):
+        return self.price_at(self.count - 1) if len(self) else None
+
+    @property
+    def low(self):
+        return self.price_at(self.mins[0]) if self.mins else None
+
+    @property
+    def high(self):
+        return self.price_at(self.maxes[0]) if self.maxes else None
+
+    def change(self, start):
+        base = self.price_at(start)
+        if not len(self) or base <= 0:
+            return None
+        return (self.last - base) / base * 100
+
+    @property
+    def change_short(self):
+        return self.change(self.short_start)
+
+    @property
+    def change_long(self):
+        return self.change(self.long_start)
+
+    @property
+    def volatility(self):
+        n = len(self) - 1
+        if n < 2:
+            return None
+        mean = self.return_sum / n
+        variance = max(0.0, self.return_squares / n - mean * mean)
+        return math.sqrt(variance) * 100
+
+    def samples(self):
+        return [(self.time_at(i), self.price_at(i)) for i in range(self.long_start, self.count)]
+
+    def window(self, values):
+        start = self.long_start % self.capacity
+        end = start + len(self)
+        if end <= self.capacity:
+            return values[start:end]
+        return values[start:] + values[:end - self.capacity]
+
+    def to_dict(self):
+        # Windows stay as array copies so snapshots are cheap; dump them with default=array.tolist
+        return {
+            "t": self.window(self.times),
+            "p": self.window(self.prices),
+            "ema": self.ema,
+            "direction": self.direction
+        }
+
+    @classmethod
+    def from_dict(cls, data, capacity, **kwargs):
+        series = cls(capacity, **kwargs)
+        times = data.get("t", [])
+        prices = data.get("p", [])
+        n = min(len(times), len(prices))
+        if not n:
+            return series
+        # Rebuild the window state in one pass instead of replaying push() per sample
+        first = max(n - capacity, bisect_left(times, times[n - 1] - series.long_window, 0, n))
+        times = [float(t) for t in times[first:n]]
+        prices = [float(p) for p in prices[first:n]]
+        n = len(times)
+        series.times[:n] = array('d', times)
+        series.prices[:n] = array('d', prices)
+        series.count = n
+        series.short_start = bisect_left(times, times[-1] - series.short_window)
+        ema = prices[0]
+        for i, price in enumerate(prices):
+            while series.mins and prices[series.mins[-1]] >= price:
+                series.mins.pop()
+            series.mins.append(i)
+            while series.maxes and prices[series.maxes[-1]] <= price:
+                series.maxes.pop()
+            series.maxes.append(i)
+            if not i:
+                continue
+            previous = prices[i - 1]
+            ema += (1 - math.exp(-(times[i] - times[i - 1]) / series.ema_period)) * (price - ema)
+            if previous > 0 and price > 0:
+                r = math.log(price / previous)
+                series.returns[i] = r
+                series.return_sum += r
+                series.return_squares += r * r
+        series.ema = data.get("ema", ema)
+        if "direction" in data:
+            series.direction = data["direction"]
+        elif n > 1 and prices[-1] != prices[-2]:
+            series.direction = 1 if prices[-1] > prices[-2] else -1
+        return series
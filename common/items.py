@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from common.cache import LRUCache
+from common.metrics import track_cache
+
+logger = logging.getLogger('DarkAndDarkerDB.Items')
+
+def archetype_of(item_id):
+    return item_id.split('_')[0]
+
+class ItemMetadataCache:
+    def __init__(self, api, path, max_entries=5000, ttl=6 * 3600, missing_ttl=300, save_interval=300):
+        self.api = api
+        self.path = path
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.save_interval = save_interval
+        self.entries = LRUCache(max_entries=max_entries)
+        # Ids their archetype response didn't include, so repeat lookups skip the refetch
+        self.missing = {}
+        self.inflight = {}
+        self.dirty = False
+        self.saver = None
+
+    async def start(self):
+        snapshot = await asyncio.to_thread(self.read_snapshot)
+        for item_id, (fetched_at, item) in snapshot.items():
+            self.entries.set(item_id, (fetched_at, item))
+        if snapshot:
+            logger.info(f"Loaded {len(self.entries)} cached items from {self.path}")
+        if self.saver is None:
+            self.saver = asyncio.create_task(self.save_periodically())
+        track_cache("item_metadata", self.entries)
+
+    async def close(self):
+        if self.saver is not None:
+            self.saver.cancel()
+            self.saver = None
+        if self.dirty:
+            await self.save_snapshot()
+
+    def seed(self, items, fetched_at):
+        for item in items:
+            entry = self.entries.entries.get(item["id"])
+            if entry is None or entry[0] < fetched_at:
+                self.entries.set(item["id"], (fetched_at, item))
+
+    async def get(self, item_id):
+        entry = self.entries.get(item_id)
+        if entry is not None:
+            fetched_at, item = entry
+            if time.time() - fetched_at > self.ttl:
+                self.start_refresh(archetype_of(item_id))
+            return item
+        if self.missing.get(item_id, 0) > time.time():
+            return None
+        try:
+            await asyncio.shield(self.start_refresh(archetype_of(item_id)))
+        except Exception as e:
+            logger.error(f"Error fetching item data for {item_id}: {e}")
+            return None
+        entry = self.entries.entries.get(item_id)
+        if entry is None:
+            self.mark_missing(item_id)
+            return None
+        return entry[1]
+
+    def mark_missing(self, item_id):
+        now = time.time()
+        if len(self.missing) >= self.entries.max_entries:
+            self.missing = {key: expires for key, expires in self.missing.items() if expires > now}
+            while len(self.missing) >= self.entries.max_entries:
+                del self.missing[next(iter(self.missing))]
+        self.missing[item_id] = now + self.missing_ttl
+
+    def start_refresh(self, archetype):
+        task = self.inflight.get(archetype)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch_archetype(archetype))
+            self.inflight[archetype] = task
+            task.add_done_callback(lambda t: self.finish_refresh(archetype, t))
+        return task
+
+    def finish_refresh(self, archetype, task):
+        self.inflight.pop(archetype, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error refreshing archetype {archetype}: {task.exception()}")
+
+    async def fetch_archetype(self, archetype):
+        data = await self.api.get_json("/items", params={"archetype": archetype})
+        if data["status"] != "OK":
+            raise Exception(f"API Error: {data['status']}")
+        now = time.time()
+        for item in data["body"] or []:
+            self.entries.set(item["id"], (now, item))
+        self.dirty = True
+        return len(data["body"] or [])
+
+    def read_snapshot(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading item snapshot {self.path}: {e}")
+            return {}
+
+    async def save_snapshot(self):
+        snapshot = {item_id: list(entry) for item_id, entry in self.entries.entries.items()}
+        self.dirty = False
+        await asyncio.to_thread(self.write_snapshot, snapshot)
+
+    def write_snapshot(self, snapshot):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    async def save_periodically(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            if self.dirty:
+                try:
+                    await self.save_snapshot()
+                except Exception as e:
+                    logger.error(f"Error saving item snapshot: {e}")
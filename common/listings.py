@@ -0,0 +1,48 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger('DarkAndDarkerDB.Listings')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_created ON listings (created);
+"""
+
+class ListingStore:
+    def __init__(self, path, max_rows=20000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def put_many(self, listings):
+        now = time.time()
+        rows = [(key, now, json.dumps(data, separators=(",", ":"))) for key, data in listings]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO listings VALUES (?, ?, ?)", rows)
+            evicted = self.conn.execute(
+                "DELETE FROM listings WHERE key IN "
+                "(SELECT key FROM listings ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_rows,)
+            ).rowcount
+        if evicted > 0:
+            logger.debug(f"Evicted {evicted} old listings from {self.path}")
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM listings WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
@@ -0,0 +1,209 @@
+import logging
+from bisect import bisect_left
+from aiohttp import web
+
+logger = logging.getLogger('DarkAndDarkerDB.Metrics')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        self.value += amount
+
+class GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1.0):
+        self.value += amount
+
+    def dec(self, amount=1.0):
+        self.value -= amount
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metric:
+    kind = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.functions = {}
+
+    def new_child(self):
+        return self.child_class()
+
+    def labels(self, *values, **labels):
+        key = values or tuple(str(labels[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self.new_child()
+        return child
+
+    def set_function(self, function, **labels):
+        # Sampled at scrape time, so the hot path pays nothing
+        self.functions[tuple(str(labels[name]) for name in self.labelnames)] = function
+
+    def remove_function(self, **labels):
+        self.functions.pop(tuple(str(labels[name]) for name in self.labelnames), None)
+
+    def samples(self):
+        for key, child in list(self.children.items()):
+            yield self.name, key, None, child.value
+        for key, function in list(self.functions.items()):
+            try:
+                value = function()
+            except Exception as e:
+                logger.error(f"Error sampling metric {self.name}: {e}")
+                continue
+            if value is not None:
+                yield self.name, key, None, value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+    child_class = CounterChild
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    kind = "gauge"
+    child_class = GaugeChild
+
+    def set(self, value):
+        self.labels().set(value)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = sorted(buckets)
+
+    def new_child(self):
+        return HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for key, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + [float("inf")], child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key, ("le", format_value(bound)), cumulative
+            yield f"{self.name}_sum", key, None, child.sum
+            yield f"{self.name}_count", key, None, child.count
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric_class, name, documentation, labelnames=(), **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered with a different type or labels")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+TICK_SECONDS = REGISTRY.histogram("bot_tick_seconds", "Duration of periodic cog ticks", ["cog", "task"])
+TICK_ERRORS = REGISTRY.counter("bot_tick_errors_total", "Periodic cog ticks that raised", ["cog", "task"])
+QUEUE_DEPTH = REGISTRY.gauge("bot_queue_depth", "Items waiting in internal queues", ["queue"])
+CACHE_HITS = REGISTRY.counter("bot_cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = REGISTRY.counter("bot_cache_misses_total", "Cache misses", ["cache"])
+CACHE_ENTRIES = REGISTRY.gauge("bot_cache_entries", "Entries held in caches", ["cache"])
+
+def track_cache(name, cache):
+    CACHE_HITS.set_function(lambda: cache.hits, cache=name)
+    CACHE_MISSES.set_function(lambda: cache.misses, cache=name)
+    CACHE_ENTRIES.set_function(lambda: len(cache), cache=name)
+
+def untrack_cache(name):
+    for metric in (CACHE_HITS, CACHE_MISSES, CACHE_ENTRIES):
+        metric.remove_function(cache=name)
+
+class MetricsServer:
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
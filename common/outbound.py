@@ -0,0 +1,275 @@
+import time
+import asyncio
+import logging
+import itertools
+from collections import defaultdict, OrderedDict
+import discord
+from common.metrics import REGISTRY, QUEUE_DEPTH
+
+logger = logging.getLogger('DarkAndDarkerDB.Outbound')
+
+INTERACTIVE = 0
+FEED = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", FEED: "feed", BACKGROUND: "background"}
+
+SENT = REGISTRY.counter("discord_outbound_sent_total", "Outbound Discord calls completed", ["priority"])
+FAILED = REGISTRY.counter("discord_outbound_failed_total", "Outbound Discord calls that failed", ["priority"])
+RATE_LIMITED = REGISTRY.counter("discord_rate_limited_total", "Discord 429 responses seen", ["source"])
+LAG_SECONDS = REGISTRY.histogram("discord_outbound_lag_seconds", "Time outbound jobs wait in the queue", ["priority"])
+
+class RouteBucket:
+    def __init__(self, capacity=5, per=5.0):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def delay(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    async def acquire(self):
+        wait = self.delay()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.delay()
+        self.tokens -= 1
+
+    def block(self, retry_after):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+class RateLimitCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if "rate limited" in record.getMessage().lower():
+            self.count += 1
+
+class OutboundJob:
+    def __init__(self, route, action, priority, coalesce_key=None, ordered=False):
+        self.route = route
+        self.action = action
+        self.priority = priority
+        self.coalesce_key = coalesce_key
+        self.ordered = ordered
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.waiters = []
+
+    def resolve(self, result=None, error=None):
+        for future in [self.future, *self.waiters]:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+class OutboundScheduler:
+    def __init__(self, workers=4, route_capacity=5, route_per=5.0):
+        self.worker_count = workers
+        self.route_capacity = route_capacity
+        self.route_per = route_per
+        self.queue = None
+        self.sequence = itertools.count()
+        self.buckets = defaultdict(lambda: RouteBucket(self.route_capacity, self.route_per))
+        self.pending = {}
+        self.key_locks = {}
+        self.workers = []
+        self.rate_limits = RateLimitCounter()
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        if self.workers:
+            return
+        self.queue = asyncio.PriorityQueue()
+        logging.getLogger('discord.http').addHandler(self.rate_limits)
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.worker_count)]
+        self.workers.append(asyncio.create_task(self.report_periodically()))
+        QUEUE_DEPTH.set_function(lambda: self.depth, queue="outbound")
+        RATE_LIMITED.set_function(lambda: self.rate_limited, source="scheduler")
+        RATE_LIMITED.set_function(lambda: self.rate_limits.count, source="discord.http")
+
+    async def close(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logging.getLogger('discord.http').removeHandler(self.rate_limits)
+
+    @property
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited + self.rate_limits.count,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag
+        }
+
+    async def report_periodically(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            if stats["depth"] or stats["last_lag"] > 1:
+                logger.info(
+                    f"Outbound queue depth {stats['depth']}, lag {stats['last_lag']:.2f}s (max {stats['max_lag']:.2f}s), "
+                    f"{stats['coalesced']} coalesced, {stats['rate_limited']} rate limited"
+                )
+
+    def submit(self, route, action, priority=FEED, coalesce_key=None, ordered=False):
+        if coalesce_key is not None:
+            job = self.pending.get(coalesce_key)
+            if job is not None:
+                # Keep the queued slot and position but run the latest payload
+                job.action = action
+                waiter = asyncio.get_running_loop().create_future()
+                waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+                job.waiters.append(waiter)
+                self.coalesced += 1
+                return waiter
+        job = OutboundJob(route, action, priority, coalesce_key, ordered)
+        if coalesce_key is not None:
+            self.pending[coalesce_key] = job
+        self.queue.put_nowait((priority, next(self.sequence), job))
+        return job.future
+
+    def send(self, channel, priority=FEED, **kwargs):
+        return self.submit(("channel", channel.id), lambda: channel.send(**kwargs), priority, ordered=True)
+
+    def edit(self, message, priority=FEED, **kwargs):
+        return self.submit(
+            ("channel", message.channel.id),
+            lambda: message.edit(**kwargs),
+            priority,
+            coalesce_key=("edit", message.id)
+        )
+
+    def delete(self, message, priority=BACKGROUND):
+        return self.submit(("channel", message.channel.id), lambda: message.delete(), priority)
+
+    def dm(self, user, priority=FEED, **kwargs):
+        return self.submit(("dm", user.id), lambda: user.send(**kwargs), priority, ordered=True)
+
+    async def run(self, job):
+        bucket = self.buckets[job.route]
+        if job.coalesce_key is not None:
+            # A later payload for the same key waits until the one in flight lands
+            entry = self.key_locks.setdefault(job.coalesce_key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    return await self.attempt(job, bucket)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    self.key_locks.pop(job.coalesce_key, None)
+        if job.ordered:
+            # One send per route at a time keeps posts in a channel in submission order
+            async with bucket.lock:
+                return await self.attempt(job, bucket)
+        return await self.attempt(job, bucket)
+
+    async def attempt(self, job, bucket):
+        while True:
+            await bucket.acquire()
+            try:
+                return await job.action()
+            except discord.RateLimited as e:
+                self.rate_limited += 1
+                bucket.block(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                self.rate_limited += 1
+                bucket.block(float(e.response.headers.get("Retry-After", 1)))
+            logger.warning(f"Rate limited on route {job.route}, backing off")
+
+    async def worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                if job.coalesce_key is not None:
+                    self.pending.pop(job.coalesce_key, None)
+                lag = time.monotonic() - job.enqueued_at
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                priority = PRIORITY_NAMES.get(job.priority, str(job.priority))
+                LAG_SECONDS.labels(priority).observe(lag)
+                try:
+                    result = await self.run(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    FAILED.labels(priority).inc()
+                    job.resolve(error=e)
+                else:
+                    self.sent += 1
+                    SENT.labels(priority).inc()
+                    job.resolve(result)
+            finally:
+                self.queue.task_done()
+
+class CoalescingEditQueue:
+    def __init__(self, scheduler, max_pending=200, priority=INTERACTIVE):
+        self.scheduler = scheduler
+        self.max_pending = max_pending
+        self.priority = priority
+        self.pending = OrderedDict()
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, message, **kwargs):
+        self.queued += 1
+        if message.id in self.pending:
+            self.coalesced += 1
+            self.pending[message.id] = (message, kwargs)
+            return
+        if len(self.pending) >= self.max_pending:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[message.id] = (message, kwargs)
+
+    def flush(self):
+        futures = []
+        while self.pending:
+            _, (message, kwargs) = self.pending.popitem(last=False)
+            futures.append(self.scheduler.edit(message, priority=self.priority, **kwargs))
+        self.flushed += len(futures)
+        return futures
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushed": self.flushed
+        }
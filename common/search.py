@@ -0,0 +1,74 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+WORD_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+def base_name(item_id):
+    return item_id.split("_")[0] if "_" in item_id else item_id
+
+def display_name(base):
+    return " ".join(WORD_PATTERN.findall(base)) or base
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class ItemSearchIndex:
+    def __init__(self, item_ids):
+        self.variants = defaultdict(list)
+        for item_id in item_ids:
+            self.variants[base_name(item_id)].append(item_id)
+        self.names = sorted(self.variants, key=str.lower)
+        self.keys = [name.lower() for name in self.names]
+        self.displays = [display_name(name) for name in self.names]
+        self.words = sorted(
+            (word.lower(), i) for i, name in enumerate(self.names) for word in WORD_PATTERN.findall(name)
+        )
+        self.word_keys = [word for word, _ in self.words]
+        self.grams = defaultdict(set)
+        for i, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                self.grams[gram].add(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def full_ids(self, base):
+        return [item_id for item_id in self.variants.get(base, []) if item_id != base]
+
+    def _prefix_matches(self, keys, query):
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + "\uffff", start)
+        return start, end
+
+    def _word_matches(self, token):
+        start, end = self._prefix_matches(self.word_keys, token)
+        return {self.words[j][1] for j in range(start, end)}
+
+    def search(self, query, limit=25):
+        tokens = query.lower().split()
+        query = "".join(tokens)
+        if not query:
+            return self.names[:limit]
+        ranks = {}
+        start, end = self._prefix_matches(self.keys, query)
+        for i in range(start, end):
+            ranks[i] = 0 if self.keys[i] == query else 1
+        word_hits = set.intersection(*(self._word_matches(token) for token in tokens))
+        for i in word_hits:
+            ranks.setdefault(i, 2)
+        if len(query) >= 3:
+            candidates = set.intersection(*(self.grams.get(gram, set()) for gram in trigrams(query)))
+        else:
+            candidates = range(len(self.keys))
+        for i in candidates:
+            if i not in ranks and query in self.keys[i]:
+                ranks[i] = 3
+        ordered = sorted(ranks, key=lambda i: (ranks[i], len(self.keys[i]), self.keys[i]))
+        return [self.names[i] for i in ordered[:limit]]
+
+    def display(self, base):
+        i = bisect_left(self.keys, base.lower())
+        if i < len(self.names) and self.names[i] == base:
+            return self.displays[i]
+        return display_name(base)
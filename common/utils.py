@@ -1,3 +1,5 @@
+import os
+import json
 from datetime import datetime
 import pytz
 import re
@@ -9,4 +11,17 @@ def extract_display_names(message):
 def format_datetime(dt_str):
     dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
     est = pytz.timezone('US/Eastern')
-    return dt.astimezone(est).strftime("%Y-%m-%d %H:%M:%S EDT")
\ No newline at end of file
+    return dt.astimezone(est).strftime("%Y-%m-%d %H:%M:%S EDT")
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_json(path, data, **kwargs):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
@@ -0,0 +1,118 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+import numpy as np
+from common.metrics import REGISTRY
+
+logger = logging.getLogger('DarkAndDarkerDB.Watchdog')
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG = REGISTRY.histogram("event_loop_lag_seconds", "Event loop scheduling lag per heartbeat", buckets=LAG_BUCKETS)
+LOOP_LAG_QUANTILE = REGISTRY.gauge("event_loop_lag_quantile_seconds", "Recent event loop lag percentiles", ["quantile"])
+LOOP_STALLS = REGISTRY.counter("event_loop_stalls_total", "Times the loop was blocked past the stall threshold")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class LoopWatchdog:
+    def __init__(self, interval=0.25, stall_threshold=0.5, slow_callback=0.1, debug_window=60.0, always_debug=False, window=2400):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.slow_callback = slow_callback
+        self.debug_window = debug_window
+        self.always_debug = always_debug
+        self.lags = deque(maxlen=window)
+        self.loop = None
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.beats = 0
+        self.reported_beat = -1
+        self.debug_until = 0.0
+        self.heartbeat_task = None
+        self.reporter_task = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        if self.heartbeat_task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.loop.slow_callback_duration = self.slow_callback
+        if self.always_debug:
+            self.loop.set_debug(True)
+        self.last_beat = time.monotonic()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        self.reporter_task = asyncio.create_task(self.report_periodically())
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+        for q in QUANTILES:
+            LOOP_LAG_QUANTILE.set_function(lambda q=q: self.percentile(q), quantile=str(q))
+        logger.info(
+            f"Loop watchdog started (heartbeat {self.interval * 1000:.0f}ms, stall {self.stall_threshold * 1000:.0f}ms, "
+            f"slow callback {self.slow_callback * 1000:.0f}ms)"
+        )
+
+    async def close(self):
+        self.stopping.set()
+        for task in (self.heartbeat_task, self.reporter_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self.heartbeat_task, self.reporter_task) if t is not None), return_exceptions=True)
+        self.heartbeat_task = None
+        self.reporter_task = None
+        if self.thread is not None:
+            await asyncio.to_thread(self.thread.join, self.interval * 4)
+            self.thread = None
+
+    def percentile(self, q):
+        if not self.lags:
+            return None
+        return float(np.percentile(np.fromiter(self.lags, dtype=float), q * 100))
+
+    async def heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self.lags.append(lag)
+            LOOP_LAG.observe(lag)
+            self.last_beat = now
+            self.beats += 1
+            if not self.always_debug and self.debug_until and now >= self.debug_until:
+                self.debug_until = 0.0
+                self.loop.set_debug(False)
+                logger.info("Slow callback detection disabled")
+
+    async def report_periodically(self, interval=300):
+        while True:
+            await asyncio.sleep(interval)
+            p50, p90, p99 = (self.percentile(q) for q in QUANTILES)
+            if p99 is not None and p99 >= self.slow_callback:
+                logger.warning(
+                    f"Event loop lag p50 {p50 * 1000:.1f}ms, p90 {p90 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms"
+                )
+
+    def watch(self):
+        while not self.stopping.wait(self.stall_threshold / 2):
+            blocked = time.monotonic() - self.last_beat - self.interval
+            if blocked < self.stall_threshold or self.reported_beat == self.beats:
+                continue
+            # Report each stall once, with the stack the loop thread is stuck in right now
+            self.reported_beat = self.beats
+            LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>"
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f}ms, loop thread stack:\n{stack}")
+            if not self.always_debug and not self.debug_until:
+                self.debug_until = time.monotonic() + self.debug_window
+                self.loop.call_soon_threadsafe(self.enable_debug)
+
+    def enable_debug(self):
+        self.loop.set_debug(True)
+        logger.info(f"Slow callback detection enabled for {self.debug_window:.0f}s (threshold {self.slow_callback * 1000:.0f}ms)")
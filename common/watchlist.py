@@ -0,0 +1,21 @@
+import os
+import json
+import logging
+from common.constants import MONITORED_ITEMS
+
+logger = logging.getLogger('DarkAndDarkerDB.Watchlist')
+
+def load_watchlist(path):
+    if not path or not os.path.exists(path):
+        return dict(MONITORED_ITEMS)
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading watchlist {path}, using defaults: {e}")
+        return dict(MONITORED_ITEMS)
+    if isinstance(data, list):
+        data = {str(item.get("name", "")).lower().replace(" ", "_"): item for item in data if isinstance(item, dict)}
+    watchlist = {key: item for key, item in data.items() if isinstance(item, dict) and item.get("id") and item.get("name")}
+    logger.info(f"Loaded {len(watchlist)} watched items from {path}")
+    return watchlist
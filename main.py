@@ -1,16 +1,56 @@
-
+import os
 import asyncio
 import discord
 from discord.ext import commands
 from common.config import Config
+from common.api import DarkerDBClient
+from common.items import ItemMetadataCache
+from common.outbound import OutboundScheduler
+from common.metrics import MetricsServer
+from common.watchdog import LoopWatchdog
 
 async def main():
+    watchdog = None
+    if Config.LOOP_WATCHDOG:
+        watchdog = LoopWatchdog(
+            stall_threshold=Config.LOOP_STALL_THRESHOLD,
+            slow_callback=Config.LOOP_SLOW_CALLBACK,
+            always_debug=Config.LOOP_DEBUG
+        )
+        watchdog.start()
     bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
-    await bot.load_extension("bots.live_market")
-    await bot.load_extension("bots.price_history")
-    await bot.load_extension("bots.trade_history")
-    await bot.load_extension("bots.trading_post")
-    await bot.start(Config.TOKEN)
+    bot.api = DarkerDBClient()
+    await bot.api.start()
+    bot.items = ItemMetadataCache(
+        bot.api,
+        os.path.join(Config.DATA_DIR, "item_metadata.json"),
+        max_entries=Config.ITEM_CACHE_ENTRIES,
+        ttl=Config.ITEM_CACHE_TTL
+    )
+    await bot.items.start()
+    bot.outbound = OutboundScheduler(workers=Config.OUTBOUND_WORKERS)
+    bot.outbound.start()
+    metrics = None
+    if Config.METRICS_PORT:
+        metrics = MetricsServer(host=Config.METRICS_HOST, port=Config.METRICS_PORT)
+        await metrics.start()
+    try:
+        await bot.load_extension("bots.live_market")
+        await bot.load_extension("bots.alerts")
+        await bot.load_extension("bots.price_history")
+        await bot.load_extension("bots.trade_history")
+        await bot.load_extension("bots.trading_post")
+        await bot.start(Config.TOKEN)
+    finally:
+        if not bot.is_closed():
+            await bot.close()
+        await bot.outbound.close()
+        if metrics is not None:
+            await metrics.close()
+        if watchdog is not None:
+            await watchdog.close()
+        await bot.items.close()
+        await bot.api.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,49 +1,37 @@
-import requests
-import json
+import os
+import asyncio
+import logging
+import argparse
+from common.config import Config
+from common.api import DarkerDBClient
+from common.catalog import CatalogCrawler
+from common.utils import write_json
 
-item_ids = []
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger('DarkAndDarkerDB.UpdatingIds')
 
-page = 1
-limit = 25
+async def main():
+    parser = argparse.ArgumentParser(description="Crawl the DarkerDB item catalog")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--catalog", default=Config.CATALOG_PATH)
+    parser.add_argument("--checkpoint", default=os.path.join(Config.DATA_DIR, "catalog_checkpoint.json"))
+    args = parser.parse_args()
 
-while True:
-    print(f"Fetching page {page}...")
-    url = f"https://api.darkerdb.com/v1/items?page={page}&limit={limit}"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        print(f"Error fetching data on page {page}. Status code: {response.status_code}")
-        break
-    
-    data = response.json()
-    items = data.get("body", [])
-    
-    if not items:
-        print("No more items found, stopping.")
-        break
-    
-    print(f"Extracting {len(items)} items from page {page}...")
-    for item in items:
-        item_id = item.get("id")
-        if item_id:
-            print(f"Extracting item id: {item_id}")
-            item_ids.append(item_id)
-    
-    pagination = data.get("pagination", {})
-    current_page = pagination.get("page", page)
-    total_pages = pagination.get("num_pages", page)
-    
-    if current_page >= total_pages:
-        print("Reached the last page.")
-        break
-    else:
-        page += 1
+    api = DarkerDBClient()
+    await api.start()
+    try:
+        crawler = CatalogCrawler(api, args.checkpoint, page_size=args.page_size, concurrency=args.concurrency)
+        catalog = await crawler.crawl()
+    finally:
+        await api.close()
 
-with open("item_ids.json", "w") as json_file:
-    json.dump(item_ids, json_file, indent=4)
-print("Item ids have been saved to 'item_ids.json'.")
+    write_json(args.catalog, catalog, separators=(",", ":"))
+    logger.info(f"Saved {len(catalog)} items to '{args.catalog}'")
+    item_ids = [item["id"] for item in catalog]
+    write_json("item_ids.json", item_ids, indent=4)
+    logger.info("Item ids have been saved to 'item_ids.json'")
+    crawler.clear_checkpoint()
 
-with open("item_ids.txt", "w") as txt_file:
-    for item_id in item_ids:
-        txt_file.write(f"{item_id}\n")
-print("Item ids have been saved to 'item_ids.txt'.")
+if __name__ == "__main__":
+    asyncio.run(main())